@@ -1,100 +1,312 @@
 import os
-from flask import Flask, request, jsonify
+import json
+import queue
+import random
+import tempfile
+import threading
+import time
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-import cv2
 import numpy as np
 from datetime import datetime
 import uuid
-import onnxruntime as ort
+from batcher import MicroBatcher
+from detectors import DETECTOR_NAMES, create_detector
+from tracking import FaceTrackCache
+from streaming import LatestFrameSlot
+from capture_writer import ShardedCaptureWriter
+from result_cache import ResultCache
+from preprocessing import InputSpec, decode_gray, preprocess_faces, scale_boxes
+from video_analysis import VideoAnalyzer, iter_video_frames
+from engines import ENGINES, FERPLUS_LABELS, benchmark_onnx_profiles, load_engine
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# Load ONNX Model (Emotion FERPlus - pre-trained on FER+ dataset)
-print("Loading ONNX emotion model...")
-try:
-    session = ort.InferenceSession("emotion_model.onnx", providers=['CPUExecutionProvider'])
-    input_name = session.get_inputs()[0].name
-    output_name = session.get_outputs()[0].name
-    print(f"[OK] ONNX model loaded! Input: {input_name}, Output: {output_name}")
-    print(f"   Input shape: {session.get_inputs()[0].shape}")
-except Exception as e:
-    print(f"[ERROR] Failed to load ONNX model: {e}")
-    session = None
-
-# FERPlus emotions (8 classes)
-emotion_labels = ["Neutral", "Happy", "Surprise", "Sad", "Angry", "Disgust", "Fear", "Contempt"]
-
-# Haar face detector
-face_cascade = cv2.CascadeClassifier(
-    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+# MODEL_PRECISION=int8 serves the quantize_model.py output instead of the float model
+MODEL_PRECISION = os.environ.get("MODEL_PRECISION", "float")
+ONNX_MODEL_PATH = "emotion_model.onnx"
+TFLITE_MODEL_PATH = "emotion_model.tflite"
+if MODEL_PRECISION == "int8":
+    if os.path.exists("emotion_model.int8.onnx"):
+        ONNX_MODEL_PATH = "emotion_model.int8.onnx"
+    else:
+        print("[ERROR] emotion_model.int8.onnx not found (run quantize_model.py), using float model")
+    if os.path.exists("emotion_model_int8.tflite"):
+        TFLITE_MODEL_PATH = "emotion_model_int8.tflite"
+
+# Inference engine: INFERENCE_ENGINE is tried first, then the rest of
+# INFERENCE_FALLBACK in order, so a missing runtime or model file falls back
+# to the next engine instead of leaving the server without a model.
+#   onnx   - ONNX Runtime, FERPlus (pre-trained on FER+, 8 classes)
+#   tflite - TFLite interpreter, the trained Keras model (6 classes)
+#   numpy  - SimpleNumpyModel, emotion_model.h5 / emotion_model_weights bundle
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "onnx")
+INFERENCE_FALLBACK = os.environ.get("INFERENCE_FALLBACK", "onnx,tflite,numpy")
+ENGINE_PATHS = {
+    "onnx": ONNX_MODEL_PATH,
+    "tflite": TFLITE_MODEL_PATH,
+    "numpy": os.environ.get("NUMPY_MODEL_PATH", "emotion_model.h5"),
+}
+# ONNX_PROFILE: latency, throughput or many-workers (see engines.ONNX_PROFILES);
+# ONNX_THREADS overrides the profile's intra-op thread count; optimized graphs
+# are cached in ONNX_CACHE_DIR (default ~/.cache/emotion-api/onnx)
+ONNX_PROFILE = os.environ.get("ONNX_PROFILE", "latency")
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", "0")) or None
+# Set by serve.py: the session built here is forked, so it stays single-threaded
+# until post_fork() builds the configured one in each worker
+PREFORK = os.environ.get("PREFORK") == "1"
+ENGINE_OPTIONS = {"onnx": {"profile": ONNX_PROFILE, "intra_threads": ONNX_THREADS, "fork_safe": PREFORK}}
+engine_order = [INFERENCE_ENGINE] + [name.strip() for name in INFERENCE_FALLBACK.split(",")
+                                     if name.strip() and name.strip() != INFERENCE_ENGINE]
+engine = load_engine(engine_order, ENGINE_PATHS, ENGINE_OPTIONS)
+if engine is not None:
+    print(f"[OK] Serving with the {engine.name} engine ({engine.path})")
+    emotion_labels = engine.labels
+    input_spec = engine.input_spec
+else:
+    print(f"[ERROR] No inference engine could be loaded (tried {', '.join(engine_order)})")
+    emotion_labels = FERPLUS_LABELS
+    input_spec = InputSpec(64, 64, "NCHW")
+
+# ONNX_BENCHMARK=1 times every ONNX profile at startup (reported at GET /engine)
+onnx_benchmark = None
+if os.environ.get("ONNX_BENCHMARK") == "1" and os.path.exists(ONNX_MODEL_PATH):
+    onnx_benchmark = benchmark_onnx_profiles(ONNX_MODEL_PATH)
+    for profile, timings in onnx_benchmark.items():
+        summary = ", ".join(f"{batch} p50 {t['p50_ms']}ms p99 {t['p99_ms']}ms" for batch, t in timings.items())
+        print(f"[INFO] ONNX profile {profile}: {summary}")
+
+# Micro-batching: concurrent /predict requests are coalesced into one engine run
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "5"))
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "32"))
+
+def create_batcher():
+    if engine is None:
+        return None
+    if not engine.batching:
+        # e.g. ONNX exports with a fixed batch of 1; re-run convert_to_onnx.py for a dynamic one
+        print(f"[INFO] {engine.name} model has a fixed batch size of {engine.max_batch_size}, micro-batching disabled")
+        return MicroBatcher(engine.run, max_batch_size=1, window_ms=0)
+    max_batch = min(MAX_BATCH_SIZE, engine.max_batch_size or MAX_BATCH_SIZE)
+    print(f"[OK] Micro-batching enabled (max {max_batch}, window {BATCH_WINDOW_MS}ms)")
+    return MicroBatcher(engine.run, max_batch_size=max_batch, window_ms=BATCH_WINDOW_MS)
+
+batcher = create_batcher()
+
+# Face detector backends: haar (default), haar_downscaled, yunet, yunet_downscaled.
+# Requests can pick another backend with the "detector" form field.
+FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "haar")
+YUNET_MODEL = os.environ.get("YUNET_MODEL", "face_detection_yunet_2023mar.onnx")
+DETECT_MAX_SIDE = int(os.environ.get("DETECT_MAX_SIDE", "320"))
+
+detectors = {}
+detectors_lock = threading.Lock()
+
+def get_detector(name=None):
+    name = name or FACE_DETECTOR
+    with detectors_lock:
+        if name not in detectors:
+            detectors[name] = create_detector(name, yunet_model=YUNET_MODEL, max_side=DETECT_MAX_SIDE)
+            print(f"[OK] Face detector '{name}' loaded")
+        return detectors[name]
+
+get_detector()
+
+# Streaming clients send a session id ("session_id" form field or X-Session-Id
+# header); their next frame is searched around the last face box first
+face_tracks = FaceTrackCache(
+    max_sessions=int(os.environ.get("TRACK_MAX_SESSIONS", "1024")),
+    ttl_s=float(os.environ.get("TRACK_TTL_S", "10")),
+    padding=float(os.environ.get("TRACK_PADDING", "0.5")),
 )
 
 UPLOAD_FOLDER = "uploads"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Archiving /predict uploads is opt-in and sampled; requests never wait on it
+ARCHIVE_UPLOADS = os.environ.get("ARCHIVE_UPLOADS", "0") == "1"
+ARCHIVE_SAMPLE_RATE = float(os.environ.get("ARCHIVE_SAMPLE_RATE", "0.1"))
+archive_queue = queue.Queue(maxsize=256)
 
 CAPTURED_FOLDER = "captured"
-os.makedirs(CAPTURED_FOLDER, exist_ok=True)
 
-@app.route("/predict", methods=["POST"])
-def predict():
-    if "image" not in request.files:
-        return jsonify({"error": "No image uploaded"}), 400
+# /capture frames are appended in the background to sharded logs in CAPTURED_FOLDER
+def create_capture_writer():
+    return ShardedCaptureWriter(
+        CAPTURED_FOLDER,
+        max_queue=int(os.environ.get("CAPTURE_QUEUE_SIZE", "1024")),
+        shard_max_bytes=int(os.environ.get("CAPTURE_SHARD_MB", "256")) * 1024 * 1024,
+    )
 
-    file = request.files["image"]
-    filename = secure_filename(file.filename)
+capture_writer = create_capture_writer()
 
-    if filename == "":
-        filename = f"{uuid.uuid4().hex}.jpg"
+def archive_worker():
+    while True:
+        path, data = archive_queue.get()
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        except Exception as e:
+            print(f"[ERROR] Failed to archive upload: {e}")
 
-    img_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(img_path)
+def start_archive_worker():
+    global archive_queue
+    if ARCHIVE_UPLOADS:
+        archive_queue = queue.Queue(maxsize=256)
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        threading.Thread(target=archive_worker, daemon=True).start()
 
-    img_color = cv2.imread(img_path)
-    if img_color is None:
-        return jsonify({"error": "Invalid image"}), 400
+start_archive_worker()
 
-    gray = cv2.cvtColor(img_color, cv2.COLOR_BGR2GRAY)
+def archive_upload(filename, data):
+    if not ARCHIVE_UPLOADS or random.random() >= ARCHIVE_SAMPLE_RATE:
+        return
+    try:
+        archive_queue.put_nowait((os.path.join(UPLOAD_FOLDER, filename), data))
+    except queue.Full:
+        # Drop the sample rather than block the request
+        pass
 
-    faces = face_cascade.detectMultiScale(
-        gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-    )
+# Results for identical (or, in perceptual mode, near-identical) images are
+# served from memory; RESULT_CACHE_MB=0 disables the cache
+result_cache = ResultCache(
+    max_bytes=int(float(os.environ.get("RESULT_CACHE_MB", "16")) * 1024 * 1024),
+    ttl_s=float(os.environ.get("RESULT_CACHE_TTL_S", "30")),
+    mode=os.environ.get("RESULT_CACHE_MODE", "exact"),
+)
+
+def post_fork():
+    # serve.py calls this in every worker process. The model, detectors and
+    # caches loaded at import are shared copy-on-write with the parent, but
+    # threads do not survive fork: build the engine's thread pool and restart
+    # the background workers here.
+    global batcher, capture_writer
+    if engine is not None:
+        engine.after_fork()
+    batcher = create_batcher()
+    capture_writer = create_capture_writer()
+    start_archive_worker()
+
+def cache_lookup(gray, endpoint, detector_name, scope=()):
+    # Returns (key, cached result or None); key is None when caching is off.
+    # scope: anything else the result depends on, e.g. the decode factor and
+    # original size that face boxes are scaled by
+    if not result_cache.enabled:
+        return None, None
+    key = result_cache.key(gray, (endpoint, detector_name or FACE_DETECTOR,
+                                  engine.path if engine else None) + tuple(scope))
+    return key, result_cache.get(key)
+
+def cache_store(key, result):
+    if key is not None:
+        result_cache.put(key, result)
+    return result
+
+def detect_faces(gray, detector_name=None, session_id=None):
+    detector = get_detector(detector_name)
+    if session_id:
+        return face_tracks.detect((detector.name, session_id), gray, detector.detect)
+    return detector.detect(gray)
+
+def requested_session():
+    return request.form.get("session_id") or request.headers.get("X-Session-Id")
+
+def requested_detector():
+    # Validated "detector" form field, or None for the configured default
+    name = request.form.get("detector") or None
+    if name is not None and name not in DETECTOR_NAMES:
+        raise ValueError(f"Unknown detector '{name}'")
+    return name
+
+# Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale as long as a face
+# DECODE_MIN_FACE_FRACTION of the shorter side keeps at least the model's
+# input size; 0 always decodes at full resolution
+DECODE_MIN_FACE_FRACTION = float(os.environ.get("DECODE_MIN_FACE_FRACTION", "0.1"))
+
+def decode_image(data):
+    # Grayscale straight from the request bytes: (gray or None, factor, original size)
+    return decode_gray(data, DECODE_MIN_FACE_FRACTION, max(input_spec.height, input_spec.width))
+
+# /predict response schemas: verbose JSON, compact JSON array, or raw bytes
+RESPONSE_FORMATS = ("json", "array", "binary")
+DEFAULT_TOP_K = 3
+
+def probability_map(probabilities):
+    # Full distribution as percentages, in emotion_labels order
+    return {label: round(float(p * 100), 2) for label, p in zip(emotion_labels, probabilities)}
+
+def top_k(prob_map, k):
+    ranked = sorted(prob_map.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [{"emotion": label, "confidence": confidence} for label, confidence in ranked]
+
+def requested_output():
+    # Validated ("format", "top_k") request options
+    fmt = request.values.get("format", "json")
+    if fmt not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose from {', '.join(RESPONSE_FORMATS)}")
+    try:
+        k = int(request.values.get("top_k", DEFAULT_TOP_K))
+    except ValueError:
+        raise ValueError("top_k must be an integer")
+    return fmt, min(max(k, 1), len(emotion_labels))
+
+def format_prediction(result, status, fmt, k):
+    if status != 200 or fmt == "json":
+        if result.get("face_detected"):
+            result["top_k"] = top_k(result["probabilities"], k)
+        return jsonify(result), status
+
+    probabilities = []
+    if result["face_detected"]:
+        probabilities = [round(result["probabilities"][label] / 100, 4) for label in emotion_labels]
+
+    if fmt == "array":
+        # Probabilities in [0, 1], in GET /labels order
+        return jsonify({"face_detected": result["face_detected"], "probabilities": probabilities}), 200
+
+    # binary: 1 byte face flag, then little-endian float32 probabilities in GET /labels order
+    body = bytes([int(result["face_detected"])]) + np.asarray(probabilities, dtype="<f4").tobytes()
+    return Response(body, mimetype="application/octet-stream")
+
+def analyze_frame(data, detector_name=None, session_id=None):
+    # Single-face pipeline shared by /predict and /stream: returns (result, status)
+    gray, _, _ = decode_image(data)
+    if gray is None:
+        return {"error": "Invalid image"}, 400
+
+    cache_key, cached = cache_lookup(gray, "predict", detector_name)
+    if cached is not None:
+        return cached, 200
+
+    try:
+        faces = detect_faces(gray, detector_name, session_id)
+    except (ValueError, FileNotFoundError) as e:
+        return {"error": str(e)}, 400
 
     if len(faces) == 0:
-        return jsonify({
+        return cache_store(cache_key, {
             "face_detected": False,
             "emotion": "No Face Detected",
             "confidence": 0
-        })
-    
-    (x, y, w, h) = faces[0]
-    
-    # Extract face region
-    face = gray[y:y+h, x:x+w]
-    
-    # Preprocess for FERPlus ONNX model (64x64 grayscale)
-    face = cv2.resize(face, (64, 64))
-    face = face.astype(np.float32)
+        }), 200
     
-    # Normalize to [0, 1]
-    face = face / 255.0
-    
-    # Reshape to NCHW format: (1, 1, 64, 64)
-    face = np.expand_dims(face, axis=0)  # (1, 64, 64)
-    face = np.expand_dims(face, axis=0)  # (1, 1, 64, 64)
-
     try:
-        if session is None:
-            return jsonify({"error": "Model not loaded"}), 500
+        if batcher is None:
+            return {"error": "Model not loaded"}, 500
         
-        # Run ONNX inference
-        outputs = session.run([output_name], {input_name: face})
-        prediction = outputs[0][0]
-        
-        # Apply softmax
-        exp_pred = np.exp(prediction - np.max(prediction))
-        probabilities = exp_pred / exp_pred.sum()
+        # Preprocess the first face only into input_spec's layout and run
+        # inference (batched with concurrent requests); the batcher copies the
+        # sample when it stacks the batch
+        with preprocess_faces(gray, faces[:1], input_spec) as batch:
+            probabilities = batcher.submit(batch[0])
         
         max_index = int(np.argmax(probabilities))
         emotion = emotion_labels[max_index]
@@ -102,17 +314,251 @@ def predict():
         
         print(f"[OK] Detected: {emotion} ({confidence:.1f}%)")
 
-        return jsonify({
+        return cache_store(cache_key, {
             "face_detected": True,
             "emotion": emotion,
-            "confidence": round(confidence, 2)
-        })
+            "confidence": round(confidence, 2),
+            "probabilities": probability_map(probabilities)
+        }), 200
+    except Exception as e:
+        print(f"❌ Prediction Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {"error": str(e)}, 500
+
+# Video analysis (/video uploads and /stream?mode=video): frames are gated by
+# scene change and motion, probabilities are EMA-smoothed per face
+VIDEO_SAMPLE_FPS = float(os.environ.get("VIDEO_SAMPLE_FPS", "10"))
+VIDEO_EMA_ALPHA = float(os.environ.get("VIDEO_EMA_ALPHA", "0.3"))
+VIDEO_MAX_GAP_S = float(os.environ.get("VIDEO_MAX_GAP_S", "2"))
+VIDEO_MAX_UPLOAD_MB = int(os.environ.get("VIDEO_MAX_UPLOAD_MB", "500"))
+
+def predict_faces_batch(gray, faces):
+    # One engine run for every face; (N, num_classes) probabilities
+    with preprocess_faces(gray, faces, input_spec) as batch:
+        return engine.predict_batch(batch)
+
+def create_video_analyzer(detector_name=None, alpha=VIDEO_EMA_ALPHA):
+    detector = get_detector(detector_name)
+    return VideoAnalyzer(
+        detector.detect,
+        predict_faces_batch,
+        emotion_labels,
+        alpha=alpha,
+        max_gap_s=VIDEO_MAX_GAP_S,
+    )
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    if "image" not in request.files:
+        return jsonify({"error": "No image uploaded"}), 400
+
+    file = request.files["image"]
+    data = file.read()
+
+    filename = secure_filename(file.filename)
+    archive_upload(f"{uuid.uuid4().hex}_{filename or 'upload.jpg'}", data)
+
+    try:
+        detector_name = requested_detector()
+        fmt, k = requested_output()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result, status = analyze_frame(data, detector_name, requested_session())
+    return format_prediction(result, status, fmt, k)
+
+if Sock is not None:
+    app.config["SOCK_SERVER_OPTIONS"] = {"ping_interval": 25, "max_message_size": 10 * 1024 * 1024}
+    sock = Sock(app)
+
+    @sock.route("/stream")
+    def stream(ws):
+        # Persistent WebSocket: the client sends each frame as a binary JPEG
+        # message and gets one JSON result per analyzed frame, tagged with the
+        # frame's sequence number. Frames that arrive while the previous one
+        # is still being analyzed replace each other; only the newest is kept.
+        session_id = request.args.get("session_id") or uuid.uuid4().hex
+        detector_name = request.args.get("detector") or None
+        if detector_name is not None and detector_name not in DETECTOR_NAMES:
+            ws.send(json.dumps({"error": f"Unknown detector '{detector_name}'"}))
+            return
+
+        # mode=video: gated, smoothed results from one VideoAnalyzer per connection
+        analyzer = None
+        if request.args.get("mode") == "video":
+            if engine is None:
+                ws.send(json.dumps({"error": "Model not loaded"}))
+                return
+            try:
+                analyzer = create_video_analyzer(detector_name)
+            except (ValueError, FileNotFoundError) as e:
+                ws.send(json.dumps({"error": str(e)}))
+                return
+        started = time.monotonic()
+
+        slot = LatestFrameSlot()
+
+        def receive_frames():
+            try:
+                while True:
+                    message = ws.receive()
+                    if isinstance(message, bytes):
+                        slot.put(message)
+            except ConnectionClosed:
+                pass
+            finally:
+                slot.close()
+
+        threading.Thread(target=receive_frames, daemon=True).start()
+
+        while True:
+            frame = slot.take()
+            if frame is None:
+                break
+            seq, data = frame
+            if analyzer is not None:
+                result, status = analyze_video_frame(analyzer, data, time.monotonic() - started)
+            else:
+                result, status = analyze_frame(data, detector_name, session_id)
+            result.update({"seq": seq, "status": status, "dropped": slot.dropped})
+            try:
+                ws.send(json.dumps(result))
+            except ConnectionClosed:
+                break
+
+        if analyzer is not None:
+            try:
+                ws.send(json.dumps({"timeline": analyzer.timeline(), "stats": analyzer.stats()}))
+            except ConnectionClosed:
+                pass
+        print(f"[INFO] Stream {session_id} closed: {slot.received} frames, {slot.dropped} dropped")
+else:
+    print("[INFO] flask-sock not installed, /stream WebSocket endpoint disabled")
+
+@app.route("/predict/faces", methods=["POST"])
+def predict_faces():
+    # Multi-face variant of /predict: every detected face goes through a
+    # single detection pass and a single batched inference call
+    if "image" not in request.files:
+        return jsonify({"error": "No image uploaded"}), 400
+
+    file = request.files["image"]
+    data = file.read()
+
+    filename = secure_filename(file.filename)
+    archive_upload(f"{uuid.uuid4().hex}_{filename or 'upload.jpg'}", data)
+
+    gray, factor, size = decode_image(data)
+    if gray is None:
+        return jsonify({"error": "Invalid image"}), 400
+
+    try:
+        detector_name = requested_detector()
+        cache_key, cached = cache_lookup(gray, "faces", detector_name, (factor, tuple(size)))
+        if cached is not None:
+            return jsonify(cached)
+        faces = detect_faces(gray, detector_name)
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    if len(faces) == 0:
+        return jsonify(cache_store(cache_key, {"face_detected": False, "faces": []}))
+
+    try:
+        if engine is None:
+            return jsonify({"error": "Model not loaded"}), 500
+
+        probabilities = predict_faces_batch(gray, faces)
+
+        # Boxes are reported in the uploaded image's coordinates
+        results = []
+        for (x, y, w, h), probs in zip(scale_boxes(faces, factor, size), probabilities):
+            max_index = int(np.argmax(probs))
+            results.append({
+                "box": [int(x), int(y), int(w), int(h)],
+                "emotion": emotion_labels[max_index],
+                "confidence": round(float(probs[max_index] * 100), 2),
+                "probabilities": probability_map(probs)
+            })
+
+        print(f"[OK] Detected {len(results)} faces")
+
+        return jsonify(cache_store(cache_key, {"face_detected": True, "faces": results}))
     except Exception as e:
         print(f"❌ Prediction Error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def analyze_video_frame(analyzer, data, t):
+    gray, factor, size = decode_image(data)
+    if gray is None:
+        return {"error": "Invalid image"}, 400
+    result = analyzer.process(gray, t)
+    for face in result["faces"]:
+        face["box"] = scale_boxes(face["box"], factor, size)[0].tolist()
+    result["face_detected"] = bool(result["faces"])
+    return result, 200
+
+@app.route("/video", methods=["POST"])
+def analyze_video():
+    # Whole-video analysis: returns a per-face emotion timeline instead of
+    # per-frame results. Optional form fields: sample_fps, alpha, detector.
+    # Checked before request.files, which parses and spools the whole body;
+    # max_content_length also stops uploads sent without a Content-Length
+    max_bytes = VIDEO_MAX_UPLOAD_MB * 1024 * 1024
+    too_large = jsonify({"error": f"Video larger than {VIDEO_MAX_UPLOAD_MB} MB"}), 413
+    if request.content_length and request.content_length > max_bytes:
+        return too_large
+    request.max_content_length = max_bytes
+    try:
+        uploaded = "video" in request.files
+    except RequestEntityTooLarge:
+        return too_large
+    if not uploaded:
+        return jsonify({"error": "No video uploaded"}), 400
+    if engine is None:
+        return jsonify({"error": "Model not loaded"}), 500
+
+    try:
+        detector_name = requested_detector()
+        sample_fps = float(request.form.get("sample_fps", VIDEO_SAMPLE_FPS))
+        alpha = float(request.form.get("alpha", VIDEO_EMA_ALPHA))
+        if sample_fps <= 0 or not 0 < alpha <= 1:
+            raise ValueError("sample_fps must be > 0 and alpha in (0, 1]")
+        analyzer = create_video_analyzer(detector_name, alpha)
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    # VideoCapture reads from a path, so spool the upload to a temp file
+    file = request.files["video"]
+    suffix = os.path.splitext(secure_filename(file.filename or ""))[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        file.save(tmp)
+        path = tmp.name
+
+    try:
+        start = time.perf_counter()
+        duration = 0.0
+        for gray, t in iter_video_frames(path, sample_fps):
+            analyzer.process(gray, t)
+            duration = t
+        elapsed = time.perf_counter() - start
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        os.remove(path)
+
+    stats = analyzer.stats()
+    print(f"[OK] Analyzed video: {stats['analyzed']}/{stats['frames']} frames in {elapsed:.1f}s")
+    return jsonify({
+        "duration_s": round(duration, 3),
+        "sample_fps": sample_fps,
+        "timeline": analyzer.timeline(),
+        "stats": stats,
+    })
+
 @app.route("/capture", methods=["POST"])
 def capture():
     if "image" not in request.files:
@@ -127,12 +573,66 @@ def capture():
     except:
         confidence = 0
 
-    filename = f"{emotion}_{confidence}%_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.jpg"
-    save_path = os.path.join(CAPTURED_FOLDER, filename)
-    file.save(save_path)
+    now = datetime.now()
+    filename = f"{emotion}_{confidence}%_{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.jpg"
+    metadata = {"emotion": emotion, "confidence": confidence, "time": now.isoformat()}
+
+    # Queued for the background writer; the response does not wait for disk
+    if not capture_writer.submit(filename, file.read(), metadata):
+        return jsonify({"saved": False, "error": "Capture queue full"}), 503
 
     return jsonify({"saved": True, "file": filename})
 
+@app.route("/labels")
+def labels():
+    # Class order of the array/binary /predict formats
+    return jsonify({"labels": emotion_labels})
+
+@app.route("/health")
+def health():
+    # Liveness: the worker process is up and answering
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@app.route("/ready")
+def ready():
+    # Readiness: a model is loaded and the inference worker is running
+    checks = {
+        "engine": engine is not None,
+        "batcher": batcher is not None and batcher.worker.is_alive(),
+        "detector": FACE_DETECTOR in detectors,
+    }
+    status = 200 if all(checks.values()) else 503
+    return jsonify({"ready": status == 200, "checks": checks, "pid": os.getpid()}), status
+
+@app.route("/stats")
+def stats():
+    return jsonify({
+        "tracking": face_tracks.stats(),
+        "capture": capture_writer.stats(),
+        "result_cache": result_cache.stats(),
+    })
+
+@app.route("/detectors")
+def detector_stats():
+    # Per-backend detection latency for every detector loaded so far
+    with detectors_lock:
+        loaded = dict(detectors)
+    return jsonify({
+        "default": FACE_DETECTOR,
+        "available": list(DETECTOR_NAMES),
+        "stats": {name: detector.stats.to_dict() for name, detector in loaded.items()}
+    })
+
+@app.route("/engine")
+def engine_info():
+    # Active inference engine, its capabilities and the fallback order
+    return jsonify({
+        "active": engine.capabilities() if engine is not None else None,
+        "order": engine_order,
+        "available": list(ENGINES),
+        "onnx_benchmark": onnx_benchmark,
+    })
+
 @app.route("/")
 def home():
     return "✅ Flask Backend with ONNX Model is RUNNING!"
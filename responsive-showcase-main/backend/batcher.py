@@ -0,0 +1,72 @@
+"""
+Micro-batching scheduler for model inference.
+
+Requests submit single face tensors; a worker thread coalesces whatever
+arrives within a short time window into one NCHW batch, runs the model once
+and hands each request back its own row of the result.
+"""
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class _Pending:
+    __slots__ = ("face", "event", "result", "error")
+
+    def __init__(self, face):
+        self.face = face
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    def __init__(self, run_batch, max_batch_size=16, window_ms=5.0):
+        # run_batch: callable taking an (N, C, H, W) float32 array and
+        # returning an (N, num_classes) array of probabilities
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+
+    def submit(self, face, timeout=None):
+        # face: (C, H, W) float32 for a single sample
+        pending = _Pending(face)
+        self.requests.put(pending)
+        if not pending.event.wait(timeout):
+            raise TimeoutError("Inference batch did not complete in time")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self.requests.get_nowait())
+                else:
+                    batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                probabilities = self.run_batch(np.stack([p.face for p in batch]))
+                for i, pending in enumerate(batch):
+                    pending.result = probabilities[i]
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.event.set()
@@ -0,0 +1,148 @@
+"""
+Background writer for the /capture archive.
+
+Captured frames are queued (bounded; frames are dropped when it is full) and
+a worker thread appends them in bulk to sharded binary logs instead of one
+file per frame:
+
+    captured/capture_<start>_<pid>_<n>.bin        concatenated JPEG bytes
+    captured/capture_<start>_<pid>_<n>.idx.jsonl  one JSON line per frame:
+                                                  name, offset, length, metadata
+
+The index line is written after the data it points to, so a crash never
+leaves an index entry without its bytes. iter_captures() reads them back.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+
+class ShardedCaptureWriter:
+    def __init__(self, folder, max_queue=1024, batch_size=64, shard_max_bytes=256 * 1024 * 1024):
+        self.folder = folder
+        self.batch_size = batch_size
+        self.shard_max_bytes = shard_max_bytes
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.shards = 0
+        self.data_file = None
+        self.index_file = None
+        self.shard_bytes = 0
+        self.prefix = f"capture_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+        os.makedirs(folder, exist_ok=True)
+        self.worker = threading.Thread(target=self._loop, daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def submit(self, name, data, metadata=None):
+        # Never blocks the request: returns False if the frame was dropped
+        try:
+            self.queue.put_nowait((name, data, metadata or {}))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        with self.lock:
+            self.enqueued += 1
+        return True
+
+    def _open_shard(self):
+        self._close_shard()
+        self.shards += 1
+        base = os.path.join(self.folder, f"{self.prefix}_{self.shards:05d}")
+        self.data_file = open(base + ".bin", "ab")
+        self.index_file = open(base + ".idx.jsonl", "a")
+        self.shard_bytes = 0
+
+    def _close_shard(self):
+        if self.data_file is not None:
+            self.data_file.close()
+            self.index_file.close()
+            self.data_file = self.index_file = None
+
+    def _write_batch(self, batch):
+        entries = []
+        for name, data, metadata in batch:
+            if self.data_file is None or self.shard_bytes + len(data) > self.shard_max_bytes:
+                self._flush(entries)
+                entries = []
+                self._open_shard()
+            entries.append(json.dumps({"name": name, "offset": self.shard_bytes,
+                                       "length": len(data), **metadata}))
+            self.data_file.write(data)
+            self.shard_bytes += len(data)
+        self._flush(entries)
+
+        with self.lock:
+            self.written += len(batch)
+            self.bytes_written += sum(len(data) for _, data, _ in batch)
+
+    def _flush(self, entries):
+        # Data first, then the index lines that point into it
+        if self.data_file is None:
+            return
+        self.data_file.flush()
+        if entries:
+            self.index_file.write("\n".join(entries) + "\n")
+            self.index_file.flush()
+
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"[ERROR] Failed to write captures: {e}")
+                with self.lock:
+                    self.dropped += len(batch)
+        self._close_shard()
+
+    def close(self, timeout=5.0):
+        if self.worker.is_alive():
+            self.queue.put(None)
+            self.worker.join(timeout)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "bytes_written": self.bytes_written,
+                "shards": self.shards,
+            }
+
+
+def iter_captures(folder):
+    # Yields (entry, jpeg bytes) for every frame in every shard of the archive
+    for index_path in sorted(glob.glob(os.path.join(folder, "capture_*.idx.jsonl"))):
+        data_path = index_path[:-len(".idx.jsonl")] + ".bin"
+        with open(index_path) as index_file, open(data_path, "rb") as data_file:
+            for line in index_file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                data_file.seek(entry["offset"])
+                yield entry, data_file.read(entry["length"])
@@ -0,0 +1,59 @@
+"""
+Regression check for reduced-resolution decoding (preprocessing.decode_gray).
+
+Builds large JPEGs with and without an EXIF orientation tag and checks that
+the reported original size matches a full-resolution decode and that
+scale_boxes keeps every box inside the image. imdecode applies the EXIF
+orientation, so for rotated phone photos the size in the JPEG header is the
+unrotated one.
+
+Usage: python check_decode.py
+"""
+import struct
+import sys
+
+import cv2
+import numpy as np
+
+from preprocessing import decode_gray, scale_boxes
+
+
+def with_orientation(jpeg, orientation):
+    # Insert an APP1 Exif segment holding only the orientation tag (0x0112)
+    tiff = (b"II*\x00" + struct.pack("<I", 8) + struct.pack("<H", 1)
+            + struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack("<I", 0))
+    payload = b"Exif\x00\x00" + tiff
+    return jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload + jpeg[2:]
+
+
+def check(name, data, boxes):
+    gray, factor, size = decode_gray(data)
+    full = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    expected = (full.shape[1], full.shape[0])
+    scaled = scale_boxes(boxes, factor, size)
+    inside = bool((scaled[:, 2:] >= 0).all() and (scaled[:, 0] + scaled[:, 2] <= size[0]).all()
+                  and (scaled[:, 1] + scaled[:, 3] <= size[1]).all())
+    ok = size == expected and inside
+    print(f"[{'OK' if ok else 'ERROR'}] {name}: factor {factor}, size {size} (full decode {expected}), "
+          f"boxes {scaled.tolist()}")
+    return ok
+
+
+def main():
+    image = np.random.RandomState(0).randint(0, 255, (3000, 4000), dtype=np.uint8)
+    jpeg = cv2.imencode(".jpg", image)[1].tobytes()
+    odd = cv2.imencode(".jpg", image[:2999, :3997])[1].tobytes()
+    # Detector boxes on the 1/4 scale decode (1000x750 or 750x1000), one at the corner
+    boxes = [(100, 600, 80, 80), (500, 300, 200, 200), (700, 700, 50, 50)]
+    results = [
+        check("no EXIF", jpeg, boxes),
+        check("orientation 6 (rotated 90)", with_orientation(jpeg, 6), boxes),
+        check("orientation 8 (rotated 270)", with_orientation(jpeg, 8), boxes),
+        check("orientation 3 (rotated 180)", with_orientation(jpeg, 3), boxes),
+        check("odd size, orientation 6", with_orientation(odd, 6), boxes),
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
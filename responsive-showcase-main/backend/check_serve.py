@@ -0,0 +1,107 @@
+"""
+Smoke test for serve.py with multi-threaded workers.
+
+Starts serve.py with --workers workers and ONNX_THREADS=--threads (more
+than one intra-op thread per worker, the default whenever workers < cores),
+waits until every worker has answered GET /ready, posts an image to
+/predict a few times, then stops the server. Exits non-zero when a worker
+never becomes ready, which is how a deadlocked forked ONNX session shows
+up.
+
+Run from the directory that holds the models:
+    python check_serve.py [--workers 2] [--threads 2] [--timeout 60]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import cv2
+import numpy as np
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Smoke test serve.py with multi-threaded workers")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=2, help="ONNX_THREADS per worker")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for readiness")
+    parser.add_argument("--image", help="image with a face, so /predict runs inference (default: blank frame)")
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def get(url, timeout=5):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status, json.loads(response.read())
+
+
+def post_image(url, jpeg, timeout=10):
+    boundary = "smoke-test-boundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"smoke.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + jpeg + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(url, data=body,
+                                      headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, json.loads(response.read())
+
+
+def main():
+    args = parse_args()
+    if args.image:
+        with open(args.image, "rb") as f:
+            jpeg = f.read()
+    else:
+        jpeg = cv2.imencode(".jpg", np.full((240, 320), 128, dtype=np.uint8))[1].tobytes()
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, ONNX_THREADS=str(args.threads), INFERENCE_FALLBACK="onnx")
+    serve = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+    server = subprocess.Popen([sys.executable, serve, "--workers", str(args.workers),
+                               "--host", "127.0.0.1", "--port", str(port)], env=env)
+    try:
+        # Every worker has to answer: they all accept on the same socket
+        deadline = time.monotonic() + args.timeout
+        ready = set()
+        while len(ready) < args.workers:
+            if time.monotonic() > deadline:
+                print(f"[ERROR] /ready did not answer within {args.timeout:.0f}s "
+                      f"({args.workers} workers, {args.threads} threads)")
+                return 1
+            if server.poll() is not None:
+                print(f"[ERROR] serve.py exited with status {server.returncode}")
+                return 1
+            try:
+                status, body = get(f"{base}/ready")
+                ready.add(body["pid"])
+            except OSError:
+                time.sleep(0.2)
+        status, body = get(f"{base}/engine")
+        print(f"[OK] Workers {sorted(ready)} ready; engine: {json.dumps(body['active'])}")
+        # Inference runs on each worker's own session: a deadlock hangs here
+        for _ in range(args.workers * 4):
+            status, body = post_image(f"{base}/predict", jpeg)
+        print(f"[OK] /predict {status}: {body}")
+        return 0
+    except OSError as e:
+        print(f"[ERROR] {e}")
+        return 1
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+"""
+Compile emotion_model.h5 into a memory-mappable weight bundle for SimpleNumpyModel
+"""
+import sys
+
+from numpy_backend import bundle_path, compile_weights
+
+h5_path = sys.argv[1] if len(sys.argv) > 1 else "emotion_model.h5"
+bundle_dir = sys.argv[2] if len(sys.argv) > 2 else bundle_path(h5_path)
+
+print(f"Compiling {h5_path}...")
+compile_weights(h5_path, bundle_dir)
+
+print(f"[OK] Saved weight bundle to {bundle_dir}/ successfully!")
@@ -53,6 +53,8 @@ video, img { width:100%; max-height:320px; }
 
 <script>
 const BACKEND_URL = "http://127.0.0.1:5000/predict";
+// Lets the backend track the face between camera/video frames
+const SESSION_ID = crypto.randomUUID();
 
 const emotions = ["Angry","Fear","Happy","Neutral","Sad","Surprise"];
 
@@ -104,6 +106,16 @@ function resetBars(){
   });
 }
 
+function showResult(data){
+  // Fill every bar from the full distribution; older backends only send the top emotion
+  const probs=data.probabilities||{[data.emotion]:data.confidence};
+  emotions.forEach(e=>{
+    const c=Math.round(probs[e]||0);
+    document.getElementById(`val-${e}`).textContent=c+"%";
+    document.getElementById(`bar-${e}`).style.width=c+"%";
+  });
+}
+
 function hideAll(){
   previewImg.style.display="none";
   cameraVideo.style.display="none";
@@ -115,6 +127,7 @@ function hideAll(){
 async function sendBlob(blob){
   const fd=new FormData();
   fd.append("image",blob,"frame.jpg");
+  fd.append("session_id",SESSION_ID);
   const res=await fetch(BACKEND_URL,{method:"POST",body:fd});
   return await res.json();
 }
@@ -156,10 +169,7 @@ btnPredict.onclick=async()=>{
   const data=await res.json();
   resetBars();
   if(!data.face_detected)return;
-  const e=data.emotion;
-  const c=Math.round(data.confidence);
-  document.getElementById(`val-${e}`).textContent=c+"%";
-  document.getElementById(`bar-${e}`).style.width=c+"%";
+  showResult(data);
 };
 
 /* ---------------- CAMERA ---------------- */
@@ -176,12 +186,8 @@ btnStartCam.onclick=async()=>{
     const blob=await captureFrame(cameraVideo);
     const data=await sendBlob(blob);
     if(!data.face_detected)return;
-    const e=data.emotion;
-    const c=Math.round(data.confidence);
-    resetBars();
-    await saveFrame(blob,e,c);
-    document.getElementById(`val-${e}`).textContent=c+"%";
-    document.getElementById(`bar-${e}`).style.width=c+"%";
+    saveFrame(blob,data.emotion,Math.round(data.confidence));  // archived in the background, don't hold up the UI
+    showResult(data);
   },3000);
 };
 
@@ -214,12 +220,8 @@ btnDetectVideo.onclick=async()=>{
     const blob=await captureFrame(videoPreview);
     const data=await sendBlob(blob);
     if(!data.face_detected)return;
-    const e=data.emotion;
-    const c=Math.round(data.confidence);
-    resetBars();
-    await saveFrame(blob,e,c);
-    document.getElementById(`val-${e}`).textContent=c+"%";
-    document.getElementById(`bar-${e}`).style.width=c+"%";
+    saveFrame(blob,data.emotion,Math.round(data.confidence));  // archived in the background, don't hold up the UI
+    showResult(data);
   },4000);
 };
 
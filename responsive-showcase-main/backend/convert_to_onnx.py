@@ -13,7 +13,8 @@ print("Loading Keras model...")
 model = tf.keras.models.load_model("emotion_model_pretrained.h5", compile=False)
 
 print("Converting to ONNX...")
-input_signature = [tf.TensorSpec([1, 64, 64, 1], tf.float32, name='input')]
+# Leave the batch dimension dynamic so app.py can micro-batch concurrent requests
+input_signature = [tf.TensorSpec([None, 64, 64, 1], tf.float32, name='input')]
 
 onnx_model, _ = tf2onnx.convert.from_keras(model, input_signature=input_signature)
 onnx.save(onnx_model, "emotion_model.onnx")
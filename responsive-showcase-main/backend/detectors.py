@@ -0,0 +1,160 @@
+"""
+Face detector backends for the /predict pipeline.
+
+Every detector takes a grayscale image and returns an (N, 4) int array of
+(x, y, w, h) boxes in that image's coordinates. Detectors are created by
+name through create_detector() and record their own latency.
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from pools import KeyedPool
+
+
+class DetectorStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms):
+        with self.lock:
+            self.calls += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.last_ms = elapsed_ms
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+                "max_ms": round(self.max_ms, 3),
+                "last_ms": round(self.last_ms, 3),
+            }
+
+
+class FaceDetector:
+    name = "base"
+
+    def __init__(self):
+        self.stats = DetectorStats()
+
+    def detect(self, gray):
+        start = time.perf_counter()
+        faces = self._detect(gray)
+        self.stats.record((time.perf_counter() - start) * 1000)
+        return faces
+
+    def _detect(self, gray):
+        raise NotImplementedError
+
+
+class HaarDetector(FaceDetector):
+    name = "haar"
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        super().__init__()
+        self.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+
+    def _detect(self, gray):
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors, minSize=self.min_size
+        )
+        return np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+
+
+class YuNetDetector(FaceDetector):
+    # OpenCV's DNN face detector (cv2.FaceDetectorYN) loaded from a local
+    # face_detection_yunet_*.onnx file
+    name = "yunet"
+
+    def __init__(self, model_path, score_threshold=0.8, nms_threshold=0.3, top_k=5000):
+        super().__init__()
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found: {model_path}")
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+        self.top_k = top_k
+        # FaceDetectorYN is not thread-safe and loading it builds the whole
+        # net: lend loaded instances to one request at a time
+        self.pool = KeyedPool(self._create)
+
+    def _create(self, _):
+        return cv2.FaceDetectorYN.create(
+            self.model_path, "", (320, 320),
+            self.score_threshold, self.nms_threshold, self.top_k
+        )
+
+    def _detect(self, gray):
+        height, width = gray.shape[:2]
+        image = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) if gray.ndim == 2 else gray
+        with self.pool.borrow() as detector:
+            if tuple(detector.getInputSize()) != (width, height):
+                detector.setInputSize((width, height))
+            _, faces = detector.detect(image)
+        if faces is None:
+            return np.empty((0, 4), dtype=np.int32)
+
+        # Clip to the image so crops are never empty
+        boxes = np.round(faces[:, :4]).astype(np.int32)
+        boxes[:, :2] = np.maximum(boxes[:, :2], 0)
+        boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+        return boxes[(boxes[:, 2] > 0) & (boxes[:, 3] > 0)]
+
+
+class DownscaledDetector(FaceDetector):
+    # Runs another detector on a downscaled copy and maps boxes back to the
+    # original coordinates. The inner detector's min size applies to the
+    # downscaled image.
+    def __init__(self, inner, max_side=320):
+        super().__init__()
+        self.inner = inner
+        self.max_side = max_side
+        self.name = f"{inner.name}_downscaled"
+
+    def _detect(self, gray):
+        height, width = gray.shape[:2]
+        scale = self.max_side / max(height, width)
+        if scale >= 1.0:
+            return self.inner.detect(gray)
+
+        small = cv2.resize(gray, (round(width * scale), round(height * scale)),
+                           interpolation=cv2.INTER_AREA)
+        faces = self.inner.detect(small)
+        if len(faces) == 0:
+            return faces
+
+        boxes = np.round(faces / scale).astype(np.int32)
+        boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+        boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+        return boxes
+
+
+DETECTOR_NAMES = ("haar", "haar_downscaled", "yunet", "yunet_downscaled")
+
+
+def create_detector(name, yunet_model=None, max_side=320):
+    if name == "haar":
+        return HaarDetector()
+    if name == "haar_downscaled":
+        # 30px at full resolution is roughly 15-20px after downscaling a 640px frame
+        return DownscaledDetector(HaarDetector(min_size=(15, 15)), max_side=max_side)
+    if name == "yunet":
+        return YuNetDetector(yunet_model)
+    if name == "yunet_downscaled":
+        return DownscaledDetector(YuNetDetector(yunet_model), max_side=max_side)
+    raise ValueError(f"Unknown face detector '{name}'. Choose from {', '.join(DETECTOR_NAMES)}")
@@ -0,0 +1,320 @@
+"""
+Inference engines for the emotion models.
+
+Every engine wraps one runtime behind the same interface: run(batch) takes a
+float32 batch laid out as engine.input_spec and returns (N, num_classes)
+probabilities in engine.labels order. capabilities() describes what the
+engine supports so callers can size micro-batches.
+
+    onnx    ONNX Runtime     emotion_model.onnx (FERPlus, 8 classes)
+    tflite  TFLite           emotion_model.tflite (trained Keras model, 6 classes)
+    numpy   SimpleNumpyModel emotion_model.h5 or its compiled emotion_model_weights/ bundle
+
+load_engine() tries engines in order and returns the first one that loads,
+so a host without a runtime (or a model file) keeps serving on the next one.
+
+ONNX sessions are created from a named profile (ONNX_PROFILES) instead of the
+default SessionOptions, and the optimized graph is serialized to
+ONNX_CACHE_DIR (default ~/.cache/emotion-api/onnx, outside the source tree)
+so later startups skip graph optimization.
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from pools import KeyedPool
+from preprocessing import InputSpec, softmax
+
+# FERPlus output order
+FERPLUS_LABELS = ["Neutral", "Happy", "Surprise", "Sad", "Angry", "Disgust", "Fear", "Contempt"]
+# Keras models are trained with flow_from_directory: alphabetical class folders
+KERAS_LABELS = ["Angry", "Fear", "Happy", "Neutral", "Sad", "Surprise"]
+
+
+# ONNX Runtime SessionOptions per deployment shape. intra_threads None means
+# one per CPU.
+#   latency      - one process, single requests: all cores on each run
+#   throughput   - one process, micro-batched: all cores, no busy-waiting
+#                  between batches
+#   many-workers - one process per core (see serve.py): one thread each, no
+#                  spinning and no arena, so workers do not oversubscribe
+ONNX_PROFILES = {
+    "latency": {"intra_threads": None, "spinning": True, "memory_arena": True},
+    "throughput": {"intra_threads": None, "spinning": False, "memory_arena": True},
+    "many-workers": {"intra_threads": 1, "spinning": False, "memory_arena": False},
+}
+
+
+def onnx_session_options(profile, intra_threads=None):
+    import onnxruntime as ort
+
+    if profile not in ONNX_PROFILES:
+        raise ValueError(f"Unknown ONNX profile '{profile}'. Choose from {', '.join(ONNX_PROFILES)}")
+    config = ONNX_PROFILES[profile]
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_threads or config["intra_threads"] or os.cpu_count() or 1
+    # The emotion models are a single chain of ops: nothing to run in parallel
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.enable_cpu_mem_arena = config["memory_arena"]
+    options.add_session_config_entry("session.intra_op.allow_spinning", "1" if config["spinning"] else "0")
+    return options
+
+
+ONNX_CACHE_DIR = os.environ.get("ONNX_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "emotion-api", "onnx")
+
+
+def optimized_model_path(path, cache_dir=None):
+    # emotion_model.onnx -> <cache_dir>/emotion_model.<path hash>.opt.onnx; the
+    # hash keeps same-named models from different directories apart
+    root, ext = os.path.splitext(os.path.basename(path))
+    digest = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=4).hexdigest()
+    return os.path.join(cache_dir or ONNX_CACHE_DIR, f"{root}.{digest}.opt{ext}")
+
+
+def create_onnx_session(path, profile="latency", intra_threads=None, save_optimized=True):
+    # Load the serialized optimized graph when it is newer than the model;
+    # otherwise optimize now and write it out for the next startup. The graph
+    # holds CPU-specific layout transforms: it belongs to this host only.
+    import onnxruntime as ort
+
+    options = onnx_session_options(profile, intra_threads)
+    optimized = optimized_model_path(path)
+    if os.path.exists(optimized) and os.path.getmtime(optimized) >= os.path.getmtime(path):
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(optimized, options, providers=['CPUExecutionProvider']), optimized
+        except Exception as e:
+            # e.g. written by a different onnxruntime version
+            print(f"[ERROR] Could not load {optimized} ({e}), re-optimizing")
+            options = onnx_session_options(profile, intra_threads)
+    if save_optimized:
+        try:
+            os.makedirs(os.path.dirname(optimized), exist_ok=True)
+            options.optimized_model_filepath = optimized
+        except OSError as e:
+            print(f"[ERROR] Cannot cache the optimized graph in {os.path.dirname(optimized)}: {e}")
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider']), path
+
+
+def benchmark_onnx_profiles(path, batch_sizes=(1, 8), runs=30, profiles=None):
+    # Per-profile p50/p99 latency of a zero batch, in milliseconds
+    report = {}
+    for profile in profiles or ONNX_PROFILES:
+        session, _ = create_onnx_session(path, profile, save_optimized=False)
+        model_input = session.get_inputs()[0]
+        spec = InputSpec.from_shape(model_input.shape)
+        report[profile] = {}
+        for n in batch_sizes:
+            if isinstance(model_input.shape[0], int) and n != model_input.shape[0]:
+                continue
+            feed = {model_input.name: np.zeros(spec.batch_shape(n), dtype=np.float32)}
+            session.run(None, feed)
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                session.run(None, feed)
+                timings.append((time.perf_counter() - start) * 1000)
+            report[profile][f"batch_{n}"] = {
+                "p50_ms": round(float(np.percentile(timings, 50)), 3),
+                "p99_ms": round(float(np.percentile(timings, 99)), 3),
+            }
+    return report
+
+
+class InferenceEngine:
+    name = None
+
+    def __init__(self, path, labels):
+        self.path = path
+        self.labels = labels
+        self.input_spec = None
+        # None: any batch size; otherwise the fixed batch the model accepts
+        self.max_batch_size = None
+        self.input_dtype = "float32"
+
+    @property
+    def batching(self):
+        return self.max_batch_size is None or self.max_batch_size > 1
+
+    def run(self, batch):
+        raise NotImplementedError
+
+    def after_fork(self):
+        # Called in a forked worker process: recreate anything that owns threads
+        pass
+
+    def predict_batch(self, batch):
+        # One run for the whole batch when the model allows it
+        if self.max_batch_size is None or len(batch) <= self.max_batch_size:
+            return self.run(batch)
+        step = self.max_batch_size
+        return np.concatenate([self.run(batch[i:i+step]) for i in range(0, len(batch), step)])
+
+    def capabilities(self):
+        return {
+            "engine": self.name,
+            "model": self.path,
+            "batching": self.batching,
+            "max_batch_size": self.max_batch_size,
+            "input_dtype": self.input_dtype,
+            "input_shape": list(self.input_spec.batch_shape(self.max_batch_size or "N")),
+            "layout": self.input_spec.layout,
+            "num_classes": len(self.labels),
+        }
+
+
+class OnnxEngine(InferenceEngine):
+    name = "onnx"
+
+    def __init__(self, path, labels=FERPLUS_LABELS, apply_softmax=True, profile="latency", intra_threads=None,
+                 fork_safe=False):
+        super().__init__(path, labels)
+        self.profile = profile
+        self.intra_threads = intra_threads
+        # fork_safe: this process forks workers before serving (serve.py). A
+        # session that owns an intra-op thread pool deadlocks in the forked
+        # child, so preload a single-threaded one and build the configured
+        # session in after_fork()
+        self.session, self.loaded_from = create_onnx_session(path, profile, 1 if fork_safe else intra_threads)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        # FERPlus: (N, 1, 64, 64); NHWC exports of the trained model are also accepted
+        self.input_spec = InputSpec.from_shape(model_input.shape)
+        if isinstance(model_input.shape[0], int):
+            # Older exports have a fixed batch of 1; re-run convert_to_onnx.py for a dynamic one
+            self.max_batch_size = model_input.shape[0]
+        # FERPlus outputs logits; pass apply_softmax=False for models ending in a softmax
+        self.apply_softmax = apply_softmax
+        threads = self.session.get_session_options().intra_op_num_threads
+        print(f"[OK] ONNX model loaded! Input: {self.input_name}, Output: {self.output_name}")
+        print(f"   Input shape: {model_input.shape}, profile: {profile} ({threads} threads), graph: {self.loaded_from}")
+
+    def after_fork(self):
+        # Replace the single-threaded preload session with the configured one;
+        # a configured single thread keeps the shared copy-on-write session
+        threads = onnx_session_options(self.profile, self.intra_threads).intra_op_num_threads
+        if threads != self.session.get_session_options().intra_op_num_threads:
+            self.session, self.loaded_from = create_onnx_session(self.path, self.profile, self.intra_threads)
+            print(f"[OK] Worker {os.getpid()} ONNX session: {threads} threads")
+
+    def capabilities(self):
+        capabilities = super().capabilities()
+        capabilities["profile"] = self.profile
+        capabilities["intra_threads"] = self.session.get_session_options().intra_op_num_threads
+        return capabilities
+
+    def run(self, batch):
+        outputs = self.session.run([self.output_name], {self.input_name: batch})[0]
+        if self.apply_softmax:
+            return softmax(outputs, out=outputs)
+        return outputs
+
+
+class TFLiteEngine(InferenceEngine):
+    name = "tflite"
+
+    def __init__(self, path, labels=KERAS_LABELS, num_threads=None):
+        super().__init__(path, labels)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        self.interpreter_class = Interpreter
+        self.num_threads = num_threads
+        # Interpreters are not thread-safe and allocate_tensors() is costly:
+        # request threads borrow loaded ones from the pool
+        self.pool = KeyedPool(self._create_interpreter)
+        with self.pool.borrow() as interpreter:
+            details = interpreter.get_input_details()[0]
+        self.input_spec = InputSpec.from_shape(details["shape"])
+        self.max_batch_size = int(details["shape"][0])
+        self.input_dtype = np.dtype(details["dtype"]).name
+        print(f"[OK] TFLite model loaded! Input shape: {list(details['shape'])} ({self.input_dtype})")
+
+    def after_fork(self):
+        # Interpreters own thread pools, which do not survive the fork
+        self.pool = KeyedPool(self._create_interpreter)
+
+    def _create_interpreter(self, _):
+        interpreter = self.interpreter_class(model_path=self.path, num_threads=self.num_threads)
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def run(self, batch):
+        with self.pool.borrow() as interpreter:
+            return self._invoke(interpreter, batch)
+
+    def _invoke(self, interpreter, batch):
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        dtype = input_details["dtype"]
+        if dtype != np.float32:
+            # Integer input: quantize with the tensor's own scale/zero point
+            scale, zero_point = input_details["quantization"]
+            batch = np.clip(np.round(batch / scale + zero_point),
+                            np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+        interpreter.set_tensor(input_details["index"], batch)
+        interpreter.invoke()
+        outputs = interpreter.get_tensor(output_details["index"])
+        if outputs.dtype != np.float32:
+            scale, zero_point = output_details["quantization"]
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        # get_tensor returns a copy; safe to hand out
+        return outputs
+
+
+class NumpyEngine(InferenceEngine):
+    name = "numpy"
+
+    def __init__(self, path, labels=KERAS_LABELS, bundle_dir=None):
+        super().__init__(path, labels)
+        from numpy_backend import BUNDLE_MANIFEST, bundle_path, load_model
+
+        # bundle_dir defaults to the model's own compiled bundle (emotion_model_weights/)
+        bundle_dir = bundle_dir or bundle_path(path)
+        if not os.path.exists(path) and not os.path.exists(os.path.join(bundle_dir, BUNDLE_MANIFEST)):
+            raise FileNotFoundError(path)
+        self.model = load_model(path, bundle_dir)
+        self.input_spec = self.model.input_spec
+
+    def run(self, batch):
+        return self.model.predict_batch(batch)
+
+
+ENGINES = {
+    "onnx": OnnxEngine,
+    "tflite": TFLiteEngine,
+    "numpy": NumpyEngine,
+}
+
+
+def load_engine(order, paths, options=None):
+    # order: engine names to try; paths: engine name -> model path;
+    # options: engine name -> extra constructor arguments
+    options = options or {}
+    for name in order:
+        if name not in ENGINES:
+            print(f"[ERROR] Unknown inference engine '{name}', skipping")
+            continue
+        print(f"Loading {name} emotion model ({paths[name]})...")
+        try:
+            engine = ENGINES[name](paths[name], **options.get(name, {}))
+        except Exception as e:
+            print(f"[ERROR] Failed to load {name} engine: {e}")
+            continue
+        probe = np.zeros(engine.input_spec.batch_shape(1), dtype=np.float32)
+        if engine.run(probe).shape[-1] != len(engine.labels):
+            print(f"[ERROR] {name} model output does not match its {len(engine.labels)} labels, skipping")
+            continue
+        return engine
+    return None
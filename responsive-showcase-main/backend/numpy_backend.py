@@ -1,36 +1,66 @@
+import json
+import math
+import os
+
 import numpy as np
 import h5py
 
+from pools import KeyedPool
+from preprocessing import InputSpec, softmax
+
+# Batch sizes that keep pooled activation buffer sets
+MAX_ARENA_SIZES = 4
+
+BUNDLE_MANIFEST = 'manifest.json'
+
+# Input shape of make_model.py / init_weights.py models, used when the file
+# carries no topology of its own
+DEFAULT_INPUT_SHAPE = (48, 48, 1)
+
+ACTIVATIONS = (None, 'linear', 'relu', 'softmax', 'sigmoid', 'tanh')
+
 class SimpleNumpyModel:
-    def __init__(self, h5_path):
+    def __init__(self, h5_path=None, bundle_dir=None, tfjs_path=None):
+        # Parse a Keras H5 file, a TF.js model.json, or map a bundle written by
+        # compile_weights() (much faster, and shared between processes).
+        # The layer topology is compiled into an execution plan at load time.
         self.weights = {}
-        self.load_weights(h5_path)
+        self.arenas = KeyedPool(self._create_arena, max_keys=MAX_ARENA_SIZES)
+        if bundle_dir is not None:
+            self.load_bundle(bundle_dir)
+        elif tfjs_path is not None:
+            self.load_tfjs(tfjs_path)
+        else:
+            self.load_weights(h5_path)
 
     def load_weights(self, h5_path):
         try:
             with h5py.File(h5_path, 'r') as f:
-                # This assumes the standard Keras H5 structure
-                # We need to manually match the layer names from make_model.py
-                # Layer names are usually: conv2d, conv2d_1, dense, dense_1
-                
+                # This assumes the standard Keras H5 structure: one group per
+                # layer under model_weights, and the topology as JSON in the
+                # model_config attribute (absent in init_weights.py files)
+
                 # Helper to print structure if needed
                 # def print_structure(name, obj):
                 #     print(name)
                 # f.visititems(print_structure)
 
                 # Robust Loading Logic
-                g_weights = f['model_weights']
+                g_weights = f['model_weights'] if 'model_weights' in f else f
                 layer_names = sorted(list(g_weights.keys()))
                 print(f"[INFO] Found layers in H5: {layer_names}")
 
-                conv_layers = []
-                dense_layers = []
-
                 # Recursive helper to find weights in a group
                 def find_weights_in_group(group):
                     found_w = None
                     found_b = None
-                    
+
+                    # Keras records the weight order; kernel comes before bias
+                    weight_names = [n.decode() if isinstance(n, bytes) else n
+                                    for n in group.attrs.get('weight_names', [])]
+                    if len(weight_names) == 2:
+                        return group[weight_names[0]][()], group[weight_names[1]][()]
+
                     # Helper to visit all items
                     def visitor(name, obj):
                         nonlocal found_w, found_b
@@ -40,7 +70,7 @@ class SimpleNumpyModel:
                                 found_w = obj[()]
                             elif 'bias' in base_name or 'b' in base_name:
                                 found_b = obj[()]
-                                
+
                     group.visititems(visitor)
                     return found_w, found_b
 
@@ -48,116 +78,435 @@ class SimpleNumpyModel:
                     # Ignore non-layer keys like top_level_model_weights
                     if name in ['top_level_model_weights']:
                         continue
-                        
+
                     group = g_weights[name]
+                    if not isinstance(group, h5py.Group):
+                        continue
                     W, b = find_weights_in_group(group)
-                    
-                    if W is not None and b is not None:
-                        if len(W.shape) == 4:
-                            conv_layers.append((name, W, b))
-                        elif len(W.shape) == 2:
-                            dense_layers.append((name, W, b))
-                
-                # Sort to ensure order
-                conv_layers.sort(key=lambda x: x[0])
-                dense_layers.sort(key=lambda x: x[0])
-                
-                if len(conv_layers) < 2 or len(dense_layers) < 2:
-                    raise ValueError(f"Expected at least 2 conv and 2 dense layers. Found {len(conv_layers)} conv, {len(dense_layers)} dense.")
-                    
-                print(f"[OK] Loaded {len(conv_layers)} Conv layers and {len(dense_layers)} Dense layers.")
-
-                self.W_conv1, self.b_conv1 = conv_layers[0][1], conv_layers[0][2]
-                self.W_conv2, self.b_conv2 = conv_layers[1][1], conv_layers[1][2]
-                self.W_dense1, self.b_dense1 = dense_layers[0][1], dense_layers[0][2]
-                self.W_dense2, self.b_dense2 = dense_layers[1][1], dense_layers[1][2]
-                
+
+                    if W is not None:
+                        self.weights[name] = (W, b)
+
+                model_config = f.attrs.get('model_config')
+                if model_config is not None:
+                    if isinstance(model_config, bytes):
+                        model_config = model_config.decode('utf-8')
+                    layers, input_shape = parse_keras_config(json.loads(model_config))
+                else:
+                    layers, input_shape = infer_legacy_layers(self.weights)
+
+            self.compile(layers, input_shape)
+
         except Exception as e:
             print(f"[ERROR] Failed to load weights: {e}")
             raise e
 
+    def load_tfjs(self, model_json_path):
+        # TF.js layers model (e.g. frontend/public/models/emotion/model.json):
+        # topology + weight manifest in JSON, float32 weights in binary shards
+        try:
+            with open(model_json_path) as f:
+                model = json.load(f)
+
+            base_dir = os.path.dirname(model_json_path)
+            for group in model['weightsManifest']:
+                data = b''
+                for path in group['paths']:
+                    with open(os.path.join(base_dir, path), 'rb') as f:
+                        data += f.read()
+
+                offset = 0
+                for entry in group['weights']:
+                    if entry.get('dtype', 'float32') != 'float32' or 'quantization' in entry:
+                        raise ValueError(f"Unsupported TF.js weight encoding for {entry['name']}")
+                    count = int(np.prod(entry['shape']))
+                    arr = np.frombuffer(data, dtype='<f4', count=count, offset=offset).reshape(entry['shape'])
+                    offset += count * 4
+
+                    # Names look like sequential_1/conv2d_3/kernel
+                    layer_name, weight_name = entry['name'].split('/')[-2:]
+                    W, b = self.weights.get(layer_name, (None, None))
+                    if weight_name == 'kernel':
+                        W = arr
+                    elif weight_name == 'bias':
+                        b = arr
+                    self.weights[layer_name] = (W, b)
+
+            layers, input_shape = parse_keras_config(model['modelTopology']['model_config'])
+            self.compile(layers, input_shape)
+
+        except Exception as e:
+            print(f"[ERROR] Failed to load TF.js model: {e}")
+            raise e
+
+    def load_bundle(self, bundle_dir):
+        # Memory-map each tensor read-only: pages come from the OS page cache,
+        # so every worker process shares one physical copy of the weights
+        try:
+            with open(os.path.join(bundle_dir, BUNDLE_MANIFEST)) as f:
+                manifest = json.load(f)
+
+            for layer_name, entries in manifest['tensors'].items():
+                arrays = []
+                for entry in entries:
+                    arr = np.load(os.path.join(bundle_dir, entry['file']), mmap_mode='r')
+                    if list(arr.shape) != entry['shape'] or str(arr.dtype) != entry['dtype']:
+                        raise ValueError(f"Bundle tensor {entry['file']} does not match manifest")
+                    arrays.append(arr)
+                self.weights[layer_name] = tuple(arrays)
+
+            self.compile(manifest['layers'], manifest['input_shape'])
+            print(f"[OK] Mapped weight bundle {bundle_dir} (from {manifest.get('source')})")
+
+        except Exception as e:
+            print(f"[ERROR] Failed to load weight bundle: {e}")
+            raise e
+
+    def save_bundle(self, bundle_dir, source=None):
+        os.makedirs(bundle_dir, exist_ok=True)
+        tensors = {}
+        for layer_name in self.weights:
+            # Store the float32 tensors the plan runs on, so mapping needs no cast
+            entries = []
+            for suffix, arr in zip(('kernel', 'bias'), self._float32_weights(layer_name)):
+                filename = f"{layer_name}_{suffix}.npy"
+                np.save(os.path.join(bundle_dir, filename), arr)
+                entries.append({'file': filename, 'shape': list(arr.shape), 'dtype': str(arr.dtype)})
+            tensors[layer_name] = entries
+
+        # Manifest last, so a half-written bundle is never picked up
+        manifest = {
+            'source': source,
+            'input_shape': list(self.input_shape),
+            'layers': self.layers,
+            'tensors': tensors,
+        }
+        manifest_path = os.path.join(bundle_dir, BUNDLE_MANIFEST)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    def compile(self, layers, input_shape):
+        # Resolve every layer into a plan step with static per-sample shapes,
+        # so buffers can be sized once and inference is a straight walk over
+        # vectorized ops. Dropout is dropped and activations are fused into
+        # the conv/dense step that precedes them.
+        shape = tuple(int(d) for d in input_shape)
+        plan = []
+
+        for layer in layers:
+            kind = layer['type']
+            activation = layer.get('activation')
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{activation}' in layer {layer.get('name')}")
+
+            if kind == 'conv2d':
+                W, b = self._float32_weights(layer['name'])
+                f_h, f_w, c_in, c_out = W.shape
+                s_h, s_w = layer.get('strides', (1, 1))
+                if len(shape) != 3 or shape[2] != c_in:
+                    raise ValueError(f"Conv2D layer {layer['name']} expects (H, W, {c_in}) input, got {shape}")
+                h, w, c = shape
+
+                pad = None
+                if layer.get('padding', 'valid') == 'same':
+                    h_out, w_out = math.ceil(h / s_h), math.ceil(w / s_w)
+                    pad_h = max((h_out - 1) * s_h + f_h - h, 0)
+                    pad_w = max((w_out - 1) * s_w + f_w - w, 0)
+                    pad = (pad_h // 2, pad_w // 2)
+                    h, w = h + pad_h, w + pad_w
+                else:
+                    h_out, w_out = (h - f_h) // s_h + 1, (w - f_w) // s_w + 1
+
+                step = {
+                    'op': 'conv2d', 'W': W, 'b': b, 'strides': (s_h, s_w),
+                    'activation': activation, 'pad': pad, 'padded_shape': (h, w, c),
+                    'cols_shape': (h_out * w_out, f_h * f_w * c_in),
+                    'out_shape': (h_out, w_out, c_out),
+                }
+            elif kind == 'maxpool':
+                p_h, p_w = layer.get('pool_size', (2, 2))
+                s_h, s_w = layer.get('strides') or (p_h, p_w)
+                h, w, c = shape
+                if layer.get('padding', 'valid') == 'same' and (h % s_h or w % s_w or (p_h, p_w) != (s_h, s_w)):
+                    raise ValueError(f"Unsupported 'same' padding in pooling layer {layer.get('name')}")
+                step = {
+                    'op': 'maxpool', 'pool_size': (p_h, p_w), 'strides': (s_h, s_w),
+                    'out_shape': ((h - p_h) // s_h + 1, (w - p_w) // s_w + 1, c),
+                }
+            elif kind == 'flatten':
+                step = {'op': 'flatten', 'out_shape': (int(np.prod(shape)),)}
+            elif kind == 'dense':
+                W, b = self._float32_weights(layer['name'])
+                if shape != (W.shape[0],):
+                    raise ValueError(f"Dense layer {layer['name']} expects ({W.shape[0]},) input, got {shape}")
+                step = {'op': 'dense', 'W': W, 'b': b, 'activation': activation,
+                        'out_shape': (W.shape[1],)}
+            elif kind == 'activation':
+                if plan and plan[-1]['op'] in ('conv2d', 'dense') and plan[-1]['activation'] in (None, 'linear'):
+                    plan[-1]['activation'] = activation
+                    continue
+                step = {'op': 'activation', 'activation': activation, 'out_shape': shape}
+            elif kind == 'dropout':
+                # Identity at inference time
+                continue
+            else:
+                raise ValueError(f"Unsupported layer type '{kind}'")
+
+            plan.append(step)
+            shape = step['out_shape']
+
+        self.layers = layers
+        self.input_shape = tuple(int(d) for d in input_shape)
+        self.output_shape = shape
+        self.plan = plan
+        self.arenas = KeyedPool(self._create_arena, max_keys=MAX_ARENA_SIZES)
+
+        n_conv = sum(1 for step in plan if step['op'] == 'conv2d')
+        n_dense = sum(1 for step in plan if step['op'] == 'dense')
+        print(f"[OK] Loaded {n_conv} Conv layers and {n_dense} Dense layers. Input {self.input_shape} -> Output {shape}")
+
+    def _float32_weights(self, layer_name):
+        # Inference runs in float32 end to end; float64 weights would
+        # otherwise upcast every activation. A missing bias means use_bias=False.
+        W, b = self.weights[layer_name]
+        W = np.ascontiguousarray(W, dtype=np.float32)
+        b = np.zeros(W.shape[-1], dtype=np.float32) if b is None else np.ascontiguousarray(b, dtype=np.float32)
+        return W, b
 
     def relu(self, x):
-        return np.maximum(0, x)
+        # In place: x is always a buffer owned by the arena
+        return np.maximum(x, 0, out=x)
 
     def softmax(self, x):
-        e_x = np.exp(x - np.max(x))
-        return e_x / e_x.sum(axis=-1, keepdims=True)
-
-    def max_pool_2x2(self, x):
-        # x shape: (H, W, C)
-        # Output shape: (H/2, W/2, C)
-        h, w, c = x.shape
-        new_h = h // 2
-        new_w = w // 2
-        x_reshaped = x[:new_h*2, :new_w*2, :].reshape(new_h, 2, new_w, 2, c)
-        return x_reshaped.max(axis=(1, 3))
-
-    def conv2d(self, x, W, b):
-        # x: (H_in, W_in, C_in)
+        # Row-wise and in place: each sample in a batch is normalized independently
+        return softmax(x, out=x)
+
+    def activate(self, x, activation):
+        if activation == 'relu':
+            return self.relu(x)
+        if activation == 'softmax':
+            return self.softmax(x)
+        if activation == 'sigmoid':
+            np.negative(x, out=x)
+            np.exp(x, out=x)
+            x += 1
+            return np.reciprocal(x, out=x)
+        if activation == 'tanh':
+            return np.tanh(x, out=x)
+        return x
+
+    def max_pool(self, x, pool_size=(2, 2), strides=None, out=None):
+        # x shape: (N, H, W, C)
+        # Output shape: (N, H_out, W_out, C), 'valid' pooling
+        n, h, w, c = x.shape
+        p_h, p_w = pool_size
+        s_h, s_w = strides or pool_size
+        if (p_h, p_w) == (s_h, s_w):
+            # Non-overlapping windows: a reshape, no window view needed
+            new_h = h // p_h
+            new_w = w // p_w
+            x_reshaped = x[:, :new_h*p_h, :new_w*p_w, :].reshape(n, new_h, p_h, new_w, p_w, c)
+            return np.max(x_reshaped, axis=(2, 4), out=out)
+        windows = np.lib.stride_tricks.sliding_window_view(x, (p_h, p_w), axis=(1, 2))
+        return np.max(windows[:, ::s_h, ::s_w], axis=(-2, -1), out=out)
+
+    def max_pool_2x2(self, x, out=None):
+        return self.max_pool(x, (2, 2), (2, 2), out=out)
+
+    def conv2d(self, x, W, b, strides=(1, 1), cols=None, out=None):
+        # x: (N, H_in, W_in, C_in), already padded for 'same' convolutions
         # W: (3, 3, C_in, C_out) - TF/Keras format
         # b: (C_out,)
-        
-        # Naive implementation is slow, let's try a slightly optimized valid convolution
-        # Since make_model.py used default padding='valid', output size reduces by 2
-        
-        h_in, w_in, c_in = x.shape
+        # cols / out: optional preallocated im2col and output buffers
+
+        n, h_in, w_in, c_in = x.shape
         f_h, f_w, _, c_out = W.shape
-        
-        h_out = h_in - f_h + 1
-        w_out = w_in - f_w + 1
-        
-        # Output buffer
-        out = np.zeros((h_out, w_out, c_out))
-        
-        # This is the slow part. For 48x48 input it might be acceptable (~50ms)
-        # Optimized loop:
-        for i in range(h_out):
-            for j in range(w_out):
-                # Extract patch
-                patch = x[i:i+f_h, j:j+f_w, :]  # (3, 3, C_in)
-                
-                # Vectorized dot product over kernel dims
-                # W is (3, 3, C_in, C_out)
-                # We want sum(patch * W[..., k])
-                
-                # Reshape patch to broadcast: (3, 3, C_in, 1)
-                # Multiply and sum over spatial+channel dims
-                res = np.tensordot(patch, W, axes=([0, 1, 2], [0, 1, 2])) 
-                out[i, j, :] = res
-                
-        return out + b
+        s_h, s_w = strides
+
+        h_out = (h_in - f_h) // s_h + 1
+        w_out = (w_in - f_w) // s_w + 1
+
+        if cols is None:
+            cols = np.empty((n * h_out * w_out, f_h * f_w * c_in), dtype=np.float32)
+        if out is None:
+            out = np.empty((n, h_out, w_out, c_out), dtype=np.float32)
+
+        # im2col: a strided view of every patch (no copy yet),
+        # (N, H_out, W_out, C_in, 3, 3) -> reordered to match W's (3, 3, C_in) layout
+        patches = np.lib.stride_tricks.sliding_window_view(x, (f_h, f_w), axis=(1, 2))
+        patches = patches[:, ::s_h, ::s_w].transpose(0, 1, 2, 4, 5, 3)
+        np.copyto(cols.reshape(n, h_out, w_out, f_h, f_w, c_in), patches)
+
+        # One GEMM over all output pixels of all samples:
+        # (N*H_out*W_out, 3*3*C_in) @ (3*3*C_in, C_out)
+        np.matmul(cols, W.reshape(f_h * f_w * c_in, c_out), out=out.reshape(-1, c_out))
+        out += b
+
+        return out
+
+    def dense(self, x, W, b, out=None):
+        out = np.matmul(x, W, out=out)
+        out += b
+        return out
+
+    def _create_arena(self, n):
+        # Activation buffers for a batch of N, sized from the compiled plan;
+        # pooled so every thread reuses them
+        steps = []
+        for step in self.plan:
+            buffers = {}
+            if step['op'] == 'conv2d':
+                rows, cols = step['cols_shape']
+                buffers['cols'] = np.empty((n * rows, cols), dtype=np.float32)
+                if step['pad'] is not None:
+                    # Borders stay zero; only the interior is rewritten per call
+                    buffers['padded'] = np.zeros((n,) + step['padded_shape'], dtype=np.float32)
+            if step['op'] in ('conv2d', 'maxpool', 'dense'):
+                buffers['out'] = np.empty((n,) + step['out_shape'], dtype=np.float32)
+            steps.append(buffers)
+        return {'input': np.empty((n,) + self.input_shape, dtype=np.float32), 'steps': steps}
+
+    @property
+    def input_spec(self):
+        # NHWC, e.g. 48x48x1, for preprocessing.preprocess_faces
+        return InputSpec(self.input_shape[0], self.input_shape[1], "NHWC")
 
     def predict(self, face_img):
         # face_img: (48, 48) grayscale, normalized 0-1
-        
-        # 1. Expand input dim to (48, 48, 1)
-        x = np.expand_dims(face_img, axis=-1)
-        
-        # 2. Conv1
-        x = self.conv2d(x, self.W_conv1, self.b_conv1)
-        x = self.relu(x)
-        
-        # 3. Pool1
-        x = self.max_pool_2x2(x)
-        
-        # 4. Conv2
-        x = self.conv2d(x, self.W_conv2, self.b_conv2)
-        x = self.relu(x)
-        
-        # 5. Pool2
-        x = self.max_pool_2x2(x)
-        
-        # 6. Flatten
-        x = x.flatten()
-        
-        # 7. Dense1
-        x = np.dot(x, self.W_dense1) + self.b_dense1
-        x = self.relu(x)
-        
-        # 8. Dense2 (Output)
-        x = np.dot(x, self.W_dense2) + self.b_dense2
-        x = self.softmax(x)
-        
-        return x
+        return self.predict_batch(face_img[np.newaxis])[0]
+
+    def predict_batch(self, faces):
+        # faces: (N, H, W) or (N, H, W, C), normalized 0-1, matching input_shape
+        # Returns (N, num_classes) float32 probabilities; the batch dimension
+        # is kept through every layer so each layer runs as a single
+        # vectorized op, writing into a pooled set of preallocated buffers
+        n = faces.shape[0]
+        with self.arenas.borrow(n) as arena:
+            return self._forward(faces, arena)
+
+    def _forward(self, faces, arena):
+        n = faces.shape[0]
+
+        # Copy/cast input into (N, H, W, C) float32
+        x = arena['input']
+        np.copyto(x, faces.reshape(x.shape), casting='unsafe')
+
+        for step, buffers in zip(self.plan, arena['steps']):
+            op = step['op']
+            if op == 'conv2d':
+                if step['pad'] is not None:
+                    top, left = step['pad']
+                    padded = buffers['padded']
+                    padded[:, top:top + x.shape[1], left:left + x.shape[2]] = x
+                    x = padded
+                x = self.conv2d(x, step['W'], step['b'], step['strides'],
+                                cols=buffers['cols'], out=buffers['out'])
+                x = self.activate(x, step['activation'])
+            elif op == 'maxpool':
+                x = self.max_pool(x, step['pool_size'], step['strides'], out=buffers['out'])
+            elif op == 'flatten':
+                # Per sample, same H, W, C order as Keras; a view
+                x = x.reshape(n, -1)
+            elif op == 'dense':
+                x = self.dense(x, step['W'], step['b'], out=buffers['out'])
+                x = self.activate(x, step['activation'])
+            elif op == 'activation':
+                x = self.activate(x, step['activation'])
+
+        # The arena goes back to the pool, so hand back a copy
+        return x.copy()
+
+
+def parse_keras_config(model_config):
+    # Keras Sequential model_config -> (layer specs, (H, W, C) input shape)
+    config = model_config.get('config', model_config)
+    keras_layers = config['layers'] if isinstance(config, dict) else config
+    input_shape = None
+    layers = []
+
+    for keras_layer in keras_layers:
+        class_name = keras_layer['class_name']
+        cfg = keras_layer.get('config', {})
+        batch_shape = cfg.get('batch_shape') or cfg.get('batch_input_shape')
+        if batch_shape and input_shape is None:
+            input_shape = tuple(batch_shape[1:])
+
+        if class_name == 'InputLayer':
+            continue
+        elif class_name == 'Conv2D':
+            if cfg.get('data_format', 'channels_last') != 'channels_last':
+                raise ValueError(f"Conv2D layer {cfg['name']} must be channels_last")
+            if tuple(cfg.get('dilation_rate', (1, 1))) != (1, 1) or cfg.get('groups', 1) != 1:
+                raise ValueError(f"Conv2D layer {cfg['name']} uses dilation or groups")
+            layers.append({'type': 'conv2d', 'name': cfg['name'], 'activation': cfg.get('activation'),
+                           'strides': list(cfg.get('strides', (1, 1))), 'padding': cfg.get('padding', 'valid')})
+        elif class_name == 'MaxPooling2D':
+            layers.append({'type': 'maxpool', 'name': cfg['name'], 'pool_size': list(cfg.get('pool_size', (2, 2))),
+                           'strides': cfg.get('strides'), 'padding': cfg.get('padding', 'valid')})
+        elif class_name == 'Flatten':
+            layers.append({'type': 'flatten', 'name': cfg['name']})
+        elif class_name == 'Dense':
+            layers.append({'type': 'dense', 'name': cfg['name'], 'activation': cfg.get('activation')})
+        elif class_name == 'Activation':
+            layers.append({'type': 'activation', 'name': cfg['name'], 'activation': cfg.get('activation')})
+        elif class_name == 'Dropout':
+            layers.append({'type': 'dropout', 'name': cfg['name']})
+        else:
+            raise ValueError(f"Unsupported layer class '{class_name}'")
+
+    if input_shape is None:
+        input_shape = DEFAULT_INPUT_SHAPE
+    return layers, input_shape
+
+
+def infer_legacy_layers(weights):
+    # H5 files without a model_config (init_weights.py): the make_model.py
+    # layout of Conv(relu) + MaxPool blocks, Flatten, Dense(relu)... Dense(softmax)
+    conv_names = sorted(name for name, (W, _) in weights.items() if W.ndim == 4)
+    dense_names = sorted(name for name, (W, _) in weights.items() if W.ndim == 2)
+    if not conv_names or not dense_names:
+        raise ValueError(f"Expected conv and dense layers. Found {len(conv_names)} conv, {len(dense_names)} dense.")
+
+    layers = []
+    for name in conv_names:
+        layers.append({'type': 'conv2d', 'name': name, 'activation': 'relu'})
+        layers.append({'type': 'maxpool', 'pool_size': [2, 2]})
+    layers.append({'type': 'flatten'})
+    for i, name in enumerate(dense_names):
+        last = i == len(dense_names) - 1
+        layers.append({'type': 'dense', 'name': name, 'activation': 'softmax' if last else 'relu'})
+    return layers, DEFAULT_INPUT_SHAPE
+
+
+def compile_weights(h5_path, bundle_dir):
+    # One-time step: resolve the H5 layers and write them as flat .npy files
+    model = SimpleNumpyModel(h5_path)
+    model.save_bundle(bundle_dir, source=os.path.abspath(h5_path))
+    return model
+
+
+def bundle_path(h5_path):
+    # Default bundle directory of a model: emotion_model.h5 -> emotion_model_weights/
+    return os.path.splitext(h5_path)[0] + '_weights'
+
+
+def bundle_source_matches(bundle_dir, h5_path):
+    # True when bundle_dir was compiled from h5_path (and not from another model)
+    with open(os.path.join(bundle_dir, BUNDLE_MANIFEST)) as f:
+        source = json.load(f).get('source')
+    return source is not None and os.path.realpath(source) == os.path.realpath(h5_path)
+
 
+def load_model(h5_path, bundle_dir=None):
+    # Prefer a bundle compiled from this H5 file and newer than it, else
+    # parse the H5. bundle_dir defaults to bundle_path(h5_path).
+    bundle_dir = bundle_dir or bundle_path(h5_path)
+    manifest_path = os.path.join(bundle_dir, BUNDLE_MANIFEST)
+    if os.path.exists(manifest_path) and (
+            not os.path.exists(h5_path) or
+            os.path.getmtime(manifest_path) >= os.path.getmtime(h5_path)):
+        if bundle_source_matches(bundle_dir, h5_path):
+            return SimpleNumpyModel(bundle_dir=bundle_dir)
+        print(f"[ERROR] Weight bundle {bundle_dir} was not compiled from {h5_path}, ignoring it")
+    return SimpleNumpyModel(h5_path)
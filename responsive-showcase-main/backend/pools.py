@@ -0,0 +1,50 @@
+"""
+Object pools shared by every request thread.
+
+app.run and serve.py handle each request on a new thread, so a
+threading.local() cache only ever hits on long-lived threads such as the
+batcher's worker. A KeyedPool instead lends objects (detectors, TFLite
+interpreters, preallocated buffers) to one thread at a time and takes them
+back afterwards. Objects are keyed (by input size, batch size, ...) and a
+new one is only created when every pooled object for that key is in use, so
+each pool grows to the peak request concurrency and no further.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class KeyedPool:
+    def __init__(self, factory, max_idle=4, max_keys=16):
+        # factory: key -> new object. At most max_idle idle objects are kept
+        # per key and max_keys keys; the least recently used key is dropped.
+        self.factory = factory
+        self.max_idle = max_idle
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.idle = OrderedDict()
+        self.created = 0
+
+    @contextmanager
+    def borrow(self, key=None):
+        with self.lock:
+            idle = self.idle.get(key)
+            item = idle.pop() if idle else None
+        if item is None:
+            item = self.factory(key)
+            with self.lock:
+                self.created += 1
+        try:
+            yield item
+        finally:
+            with self.lock:
+                idle = self.idle.setdefault(key, [])
+                self.idle.move_to_end(key)
+                if len(idle) < self.max_idle:
+                    idle.append(item)
+                while len(self.idle) > self.max_keys:
+                    self.idle.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.idle.clear()
@@ -0,0 +1,178 @@
+"""
+Shared pre- and post-processing for every inference backend.
+
+Request images are decoded straight to grayscale, and large JPEGs at a
+reduced scale (IMREAD_REDUCED_GRAYSCALE_2/4/8, done by libjpeg in the DCT
+domain) when the smallest face we care about stays big enough to detect
+and crop.
+
+Each backend declares an InputSpec (face size, channel layout, scale). Face
+crops are resized with cv2.resize straight into a preallocated uint8
+stack, then scaled and cast to float32 in one pass into a preallocated
+batch laid out for that backend. Buffers are pooled and shared by every
+thread: preprocess_faces() and preprocess_crops() are context managers and
+the batch they yield is only valid inside the with block.
+"""
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from pools import KeyedPool
+
+
+class InputSpec:
+    def __init__(self, height, width, layout="NCHW", scale=1.0 / 255.0):
+        if layout not in ("NCHW", "NHWC"):
+            raise ValueError(f"Unknown layout '{layout}'")
+        self.height = int(height)
+        self.width = int(width)
+        self.layout = layout
+        self.scale = np.float32(scale)
+
+    @classmethod
+    def from_shape(cls, shape):
+        # A model input shape such as [N, 1, 64, 64] or [N, 48, 48, 1]
+        if shape[1] == 1:
+            return cls(shape[2], shape[3], "NCHW")
+        return cls(shape[1], shape[2], "NHWC")
+
+    def batch_shape(self, n):
+        if self.layout == "NCHW":
+            return (n, 1, self.height, self.width)
+        return (n, self.height, self.width, 1)
+
+    def key(self):
+        return (self.height, self.width, self.layout, float(self.scale))
+
+    def __repr__(self):
+        return f"InputSpec({self.height}x{self.width}, {self.layout})"
+
+
+def _create_buffers(key):
+    (height, width, layout, _), n = key
+    spec = InputSpec(height, width, layout)
+    return (np.empty((n, height, width), dtype=np.uint8),
+            np.empty(spec.batch_shape(n), dtype=np.float32))
+
+
+_buffers = KeyedPool(_create_buffers)
+
+
+REDUCED_GRAYSCALE = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...) carry the size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    # (width, height) from the JPEG header without decoding, or None
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], "big")
+            width = int.from_bytes(data[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def reduction_factor(width, height, min_face_fraction, min_face_px):
+    # Largest JPEG scale (1, 2, 4 or 8) at which a face min_face_fraction of
+    # the shorter side is still at least min_face_px pixels
+    smallest_face = min(width, height) * min_face_fraction
+    for factor in (8, 4, 2):
+        if smallest_face / factor >= min_face_px:
+            return factor
+    return 1
+
+
+def decode_gray(data, min_face_fraction=0.1, min_face_px=64):
+    # Returns (gray image or None, factor, (width, height) of the original);
+    # min_face_fraction=0 always decodes at full size. np.frombuffer does not copy.
+    if not data:
+        return None, 1, None
+    size = jpeg_size(data) if min_face_fraction > 0 else None
+    factor = reduction_factor(size[0], size[1], min_face_fraction, min_face_px) if size else 1
+    gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCED_GRAYSCALE[factor])
+    if gray is None:
+        return None, 1, None
+    decoded = (gray.shape[1], gray.shape[0])
+    if size is None:
+        return gray, factor, decoded
+    if decoded != reduced_size(size, factor):
+        # imdecode applies the EXIF orientation but the header holds the
+        # stored size: a 90/270 degree rotation swaps width and height
+        size = (size[1], size[0])
+        if decoded != reduced_size(size, factor):
+            size = (decoded[0] * factor, decoded[1] * factor)
+    return gray, factor, size
+
+
+def reduced_size(size, factor):
+    # libjpeg rounds scaled dimensions up
+    return -(-size[0] // factor), -(-size[1] // factor)
+
+
+def scale_boxes(boxes, factor, size):
+    # (x, y, w, h) boxes on a reduced image -> original image, clipped to it
+    width, height = size
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    if factor == 1:
+        return boxes
+    boxes = boxes * factor
+    boxes[:, 2] = np.maximum(np.minimum(boxes[:, 2], width - boxes[:, 0]), 0)
+    boxes[:, 3] = np.maximum(np.minimum(boxes[:, 3], height - boxes[:, 1]), 0)
+    return boxes
+
+
+@contextmanager
+def preprocess_faces(gray, faces, spec):
+    # Crop, resize and normalize every (x, y, w, h) face of a grayscale image
+    # into one float32 batch shaped for spec
+    with _buffers.borrow((spec.key(), len(faces))) as (resized, batch):
+        for i, (x, y, w, h) in enumerate(faces):
+            cv2.resize(gray[y:y+h, x:x+w], (spec.width, spec.height), dst=resized[i])
+        yield scale_into(resized, batch, spec)
+
+
+@contextmanager
+def preprocess_crops(crops, spec):
+    # Same as preprocess_faces for already-cropped grayscale faces of any size
+    with _buffers.borrow((spec.key(), len(crops))) as (resized, batch):
+        for i, crop in enumerate(crops):
+            if crop.shape[:2] == (spec.height, spec.width):
+                resized[i] = crop
+            else:
+                cv2.resize(crop, (spec.width, spec.height), dst=resized[i])
+        yield scale_into(resized, batch, spec)
+
+
+def scale_into(resized, batch, spec):
+    # Fused uint8 -> float32 cast and scale, written in the spec's layout
+    np.multiply(resized, spec.scale, out=batch.reshape(resized.shape), casting="unsafe")
+    return batch
+
+
+def softmax(logits, out=None):
+    # Row-wise softmax over an (N, num_classes) batch; in place when out is logits
+    if out is None:
+        out = np.empty_like(logits, dtype=np.float32)
+    np.subtract(logits, logits.max(axis=-1, keepdims=True), out=out)
+    np.exp(out, out=out)
+    out /= out.sum(axis=-1, keepdims=True)
+    return out
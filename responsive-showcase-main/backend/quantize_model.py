@@ -0,0 +1,196 @@
+"""
+INT8 post-training quantization for the emotion models.
+
+Calibrates on a sample of emotion-training/test images, writes
+emotion_model.int8.onnx (from emotion_model.onnx) and
+emotion_model_int8.tflite (from emotion_model.h5), then reports the
+accuracy and latency change of each INT8 model against its float version.
+"""
+import os
+os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
+
+import argparse
+import glob
+import json
+import random
+import time
+
+import cv2
+import numpy as np
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "emotion-training", "test")
+
+ONNX_FLOAT = "emotion_model.onnx"
+ONNX_INT8 = "emotion_model.int8.onnx"
+KERAS_FLOAT = "emotion_model.h5"
+TFLITE_FLOAT = "emotion_model.tflite"
+TFLITE_INT8 = "emotion_model_int8.tflite"
+REPORT_PATH = "quantization_report.json"
+
+# Test folder name -> index in app.py's FERPlus emotion_labels
+FERPLUS_INDEX = {"neutral": 0, "happy": 1, "surprise": 2, "sad": 3,
+                 "angry": 4, "disgust": 5, "fear": 6, "contempt": 7}
+
+
+def list_samples(count, seed):
+    # (path, class name) pairs drawn across every class folder
+    samples = [(path, os.path.basename(os.path.dirname(path)))
+               for path in glob.glob(os.path.join(TEST_DIR, "*", "*.jpg"))]
+    samples.sort()
+    random.Random(seed).shuffle(samples)
+    return samples[:count]
+
+
+def load_face(path, size):
+    # Same preprocessing as app.py: grayscale, resized, scaled to [0, 1]
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    return cv2.resize(gray, (size, size)).astype(np.float32) / 255.0
+
+
+def onnx_input(face, shape):
+    # The FERPlus model is NCHW (1, 1, 64, 64); tf2onnx exports are NHWC
+    if shape[1] == 1:
+        return face[np.newaxis, np.newaxis]
+    return face[np.newaxis, :, :, np.newaxis]
+
+
+def evaluate(run, inputs, labels):
+    # Top-1 predictions, accuracy against labels and mean single-sample latency
+    predictions = []
+    start = time.perf_counter()
+    for x in inputs:
+        predictions.append(int(np.argmax(run(x))))
+    latency_ms = (time.perf_counter() - start) * 1000 / max(len(inputs), 1)
+    predictions = np.array(predictions)
+    accuracy = float(np.mean(predictions == np.array(labels))) if len(labels) else 0.0
+    return predictions, accuracy, latency_ms
+
+
+def compare(name, float_path, int8_path, float_eval, int8_eval):
+    float_pred, float_acc, float_ms = float_eval
+    int8_pred, int8_acc, int8_ms = int8_eval
+    report = {
+        "float_model": float_path,
+        "int8_model": int8_path,
+        "float_size_kb": round(os.path.getsize(float_path) / 1024, 1),
+        "int8_size_kb": round(os.path.getsize(int8_path) / 1024, 1),
+        "float_accuracy": round(float_acc, 4),
+        "int8_accuracy": round(int8_acc, 4),
+        "accuracy_delta": round(int8_acc - float_acc, 4),
+        "top1_agreement": round(float(np.mean(float_pred == int8_pred)), 4),
+        "float_latency_ms": round(float_ms, 3),
+        "int8_latency_ms": round(int8_ms, 3),
+        "latency_delta_ms": round(int8_ms - float_ms, 3),
+    }
+    print(f"[OK] {name}: accuracy {float_acc:.3f} -> {int8_acc:.3f} "
+          f"({report['accuracy_delta']:+.3f}), latency {float_ms:.2f}ms -> {int8_ms:.2f}ms, "
+          f"size {report['float_size_kb']}KB -> {report['int8_size_kb']}KB")
+    return report
+
+
+def quantize_onnx(calibration, evaluation):
+    import onnxruntime as ort
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat,
+                                          QuantType, quantize_static)
+
+    float_session = ort.InferenceSession(ONNX_FLOAT, providers=['CPUExecutionProvider'])
+    model_input = float_session.get_inputs()[0]
+    size = model_input.shape[2] if model_input.shape[1] == 1 else model_input.shape[1]
+
+    class FaceReader(CalibrationDataReader):
+        def __init__(self):
+            self.samples = iter(calibration)
+
+        def get_next(self):
+            sample = next(self.samples, None)
+            if sample is None:
+                return None
+            return {model_input.name: onnx_input(load_face(sample[0], size), model_input.shape)}
+
+    print(f"Quantizing {ONNX_FLOAT} with {len(calibration)} calibration images...")
+    quantize_static(ONNX_FLOAT, ONNX_INT8, FaceReader(),
+                    quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+    int8_session = ort.InferenceSession(ONNX_INT8, providers=['CPUExecutionProvider'])
+    inputs = [onnx_input(load_face(path, size), model_input.shape) for path, _ in evaluation]
+    labels = [FERPLUS_INDEX[cls] for _, cls in evaluation]
+
+    def runner(session):
+        output_name = session.get_outputs()[0].name
+        return lambda x: session.run([output_name], {model_input.name: x})[0][0]
+
+    return compare("ONNX", ONNX_FLOAT, ONNX_INT8,
+                   evaluate(runner(float_session), inputs, labels),
+                   evaluate(runner(int8_session), inputs, labels))
+
+
+def quantize_tflite(calibration, evaluation):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(KERAS_FLOAT, compile=False)
+    size = model.input_shape[1]
+
+    def representative_dataset():
+        for path, _ in calibration:
+            yield [load_face(path, size)[np.newaxis, :, :, np.newaxis]]
+
+    print(f"Quantizing {KERAS_FLOAT} with {len(calibration)} calibration images...")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    # Full-integer kernels; float input/output so callers need no changes
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(TFLITE_INT8, "wb") as f:
+        f.write(converter.convert())
+
+    if not os.path.exists(TFLITE_FLOAT):
+        with open(TFLITE_FLOAT, "wb") as f:
+            f.write(tf.lite.TFLiteConverter.from_keras_model(model).convert())
+
+    # Keras models are trained with flow_from_directory: alphabetical class order
+    classes = sorted(os.listdir(TEST_DIR))
+    inputs = [load_face(path, size)[np.newaxis, :, :, np.newaxis] for path, _ in evaluation]
+    labels = [classes.index(cls) for _, cls in evaluation]
+
+    def runner(path):
+        interpreter = tf.lite.Interpreter(model_path=path, num_threads=1)
+        interpreter.allocate_tensors()
+        input_index = interpreter.get_input_details()[0]["index"]
+        output_index = interpreter.get_output_details()[0]["index"]
+
+        def run(x):
+            interpreter.set_tensor(input_index, x)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_index)[0]
+        return run
+
+    return compare("TFLite", TFLITE_FLOAT, TFLITE_INT8,
+                   evaluate(runner(TFLITE_FLOAT), inputs, labels),
+                   evaluate(runner(TFLITE_INT8), inputs, labels))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calibration-samples", type=int, default=300)
+    parser.add_argument("--eval-samples", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-onnx", action="store_true")
+    parser.add_argument("--skip-tflite", action="store_true")
+    args = parser.parse_args()
+
+    samples = list_samples(args.calibration_samples + args.eval_samples, args.seed)
+    calibration = samples[:args.calibration_samples]
+    evaluation = samples[args.calibration_samples:]
+
+    report = {}
+    if not args.skip_onnx:
+        report["onnx"] = quantize_onnx(calibration, evaluation)
+    if not args.skip_tflite:
+        report["tflite"] = quantize_tflite(calibration, evaluation)
+
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"[OK] Saved {REPORT_PATH} successfully!")
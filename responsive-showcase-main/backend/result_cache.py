@@ -0,0 +1,99 @@
+"""
+Result cache for the prediction endpoints.
+
+Results are keyed by a hash of the decoded grayscale image, so re-submitted
+images skip detection and inference. In "perceptual" mode the key is a
+64-bit difference hash instead, so near-identical frames (paused video,
+static kiosk scenes, re-encoded JPEGs) of the same size share one entry. Entries expire
+after a TTL and the cache is bounded by the approximate size of the stored
+results in bytes, evicting least recently used entries first.
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Per-entry bookkeeping on top of the serialized result size
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class ResultCache:
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl_s=30.0, mode="exact"):
+        if mode not in ("exact", "perceptual"):
+            raise ValueError(f"Unknown result cache mode '{mode}'")
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.mode = mode
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, gray, scope):
+        # scope: anything else the result depends on (endpoint, detector, ...)
+        if self.mode == "perceptual":
+            # dHash: sign of horizontal gradients on a 9x8 thumbnail
+            small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+            bits = np.packbits(small[:, 1:] > small[:, :-1])
+            digest = bits.tobytes().hex()
+        else:
+            digest = hashlib.blake2b(np.ascontiguousarray(gray).data, digest_size=16).hexdigest()
+        # Results such as face boxes are in image coordinates: never share
+        # them between sizes, even when the dHash matches
+        return (scope, f"{gray.shape[0]}x{gray.shape[1]}:{digest}")
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] > self.ttl_s:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        # Callers add per-request fields to results, so never hand out the stored one
+        return copy.deepcopy(entry[0])
+
+    def put(self, key, result):
+        size = len(json.dumps(result)) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (copy.deepcopy(result), size, time.monotonic())
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size_bytes -= size
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "entries": len(self.entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
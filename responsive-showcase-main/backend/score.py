@@ -0,0 +1,252 @@
+"""
+Offline bulk scoring for image folders and video files.
+
+Runs the same detector, preprocessing and inference engine as app.py
+without going through HTTP. Decoder threads read images (or walk video
+frames with cv2.VideoCapture), detect faces and queue the crops; the main
+thread drains the queue in batches of --batch-size, runs one inference per
+batch and streams rows to the output file (.csv, .jsonl or .parquet).
+
+Usage:
+    python score.py ../emotion-training/test -o test_scores.csv --no-detect
+    python score.py clip.mp4 --every 5 -o clip.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from detectors import DETECTOR_NAMES, create_detector
+from engines import ENGINES, load_engine
+from preprocessing import preprocess_crops
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm"}
+
+ENGINE_PATHS = {
+    "onnx": "emotion_model.onnx",
+    "tflite": "emotion_model.tflite",
+    "numpy": "emotion_model.h5",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Score image folders and videos with the emotion model")
+    parser.add_argument("inputs", nargs="+", help="image files, video files or directories (searched recursively)")
+    parser.add_argument("-o", "--output", default="scores.csv", help="output file: .csv, .jsonl or .parquet")
+    parser.add_argument("--engine", default="onnx", choices=list(ENGINES))
+    parser.add_argument("--model", help="model path for --engine (default: the app.py model)")
+    parser.add_argument("--detector", default="haar", choices=list(DETECTOR_NAMES))
+    parser.add_argument("--yunet-model", default="face_detection_yunet_2023mar.onnx")
+    parser.add_argument("--no-detect", action="store_true",
+                        help="score each image as one face crop (e.g. emotion-training/test)")
+    parser.add_argument("--all-faces", action="store_true", help="score every face, not only the first")
+    parser.add_argument("--every", type=int, default=1, help="score every Nth video frame")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="decoder/detector threads")
+    return parser.parse_args()
+
+
+def list_inputs(paths):
+    # Sorted image/video files under every path
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names)
+        else:
+            files.append(path)
+    extensions = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+    return sorted(f for f in files if os.path.splitext(f)[1].lower() in extensions)
+
+
+class ResultWriter:
+    # Streams rows to CSV/JSONL; Parquet is written once at close (needs pandas + pyarrow)
+    def __init__(self, path, labels):
+        self.path = path
+        self.format = os.path.splitext(path)[1].lower().lstrip(".")
+        if self.format not in ("csv", "jsonl", "parquet"):
+            raise ValueError(f"Unknown output format '{self.format}'. Use .csv, .jsonl or .parquet")
+        self.fields = ["source", "frame", "time_s", "face", "x", "y", "w", "h",
+                       "emotion", "confidence"] + labels
+        self.rows = []
+        self.file = None
+        if self.format == "parquet":
+            # Fail before scoring, not after
+            try:
+                import pandas  # noqa: F401
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ValueError("Parquet output needs pandas and pyarrow (pip install pandas pyarrow)")
+        else:
+            self.file = open(path, "w", newline="")
+            if self.format == "csv":
+                self.csv = csv.DictWriter(self.file, fieldnames=self.fields)
+                self.csv.writeheader()
+
+    def write(self, rows):
+        if self.format == "csv":
+            self.csv.writerows(rows)
+        elif self.format == "jsonl":
+            self.file.write("".join(json.dumps(row) + "\n" for row in rows))
+        else:
+            self.rows.extend(rows)
+
+    def close(self):
+        if self.format == "parquet":
+            import pandas as pd
+            pd.DataFrame(self.rows, columns=self.fields).to_parquet(self.path, index=False)
+        else:
+            self.file.close()
+
+
+class FrameProducer:
+    # Decoder threads: path -> (source, frame, time_s, [(box, crop), ...]) items
+    def __init__(self, files, detector, args, max_pending):
+        self.files = queue.Queue()
+        for path in files:
+            self.files.put(path)
+        self.detector = detector
+        self.all_faces = args.all_faces
+        self.every = max(1, args.every)
+        self.items = queue.Queue(maxsize=max_pending)
+        self.errors = 0
+        self.threads = [threading.Thread(target=self._loop, daemon=True) for _ in range(max(1, args.workers))]
+        self.running = len(self.threads)
+        self.lock = threading.Lock()
+        for thread in self.threads:
+            thread.start()
+
+    def _faces(self, gray):
+        if self.detector is None:
+            return [((0, 0, gray.shape[1], gray.shape[0]), gray)]
+        faces = self.detector.detect(gray)
+        if not self.all_faces:
+            faces = faces[:1]
+        return [(tuple(int(v) for v in box), gray[box[1]:box[1]+box[3], box[0]:box[0]+box[2]])
+                for box in faces]
+
+    def _image(self, path):
+        gray = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("could not decode image")
+        self.items.put((path, 0, None, self._faces(gray)))
+
+    def _video(self, path):
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise ValueError("could not open video")
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        index = 0
+        try:
+            while True:
+                # grab() skips decoding the frames we do not score
+                if not capture.grab():
+                    break
+                if index % self.every == 0:
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        break
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    time_s = round(index / fps, 3) if fps else None
+                    self.items.put((path, index, time_s, self._faces(gray)))
+                index += 1
+        finally:
+            capture.release()
+
+    def _loop(self):
+        while True:
+            try:
+                path = self.files.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+                    self._video(path)
+                else:
+                    self._image(path)
+            except Exception as e:
+                print(f"[ERROR] {path}: {e}")
+                with self.lock:
+                    self.errors += 1
+        with self.lock:
+            self.running -= 1
+            if self.running == 0:
+                self.items.put(None)
+
+    def __iter__(self):
+        while True:
+            item = self.items.get()
+            if item is None:
+                return
+            yield item
+
+
+def score(args):
+    files = list_inputs(args.inputs)
+    if not files:
+        print("[ERROR] No images or videos found")
+        return 1
+
+    engine = load_engine([args.engine], {args.engine: args.model or ENGINE_PATHS[args.engine]})
+    if engine is None:
+        return 1
+    labels = engine.labels
+    try:
+        detector = None if args.no_detect else create_detector(args.detector, yunet_model=args.yunet_model)
+        writer = ResultWriter(args.output, labels)
+    except (ValueError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    print(f"Scoring {len(files)} files with {args.workers} decoder threads, batches of {args.batch_size}...")
+    start = time.perf_counter()
+    frames = faces_scored = 0
+    pending = []
+
+    def flush():
+        # One inference for every face crop collected so far
+        with preprocess_crops([crop for _, crop in pending], engine.input_spec) as batch:
+            probabilities = engine.predict_batch(batch)
+        rows = []
+        for (row, _), probs in zip(pending, probabilities):
+            best = int(np.argmax(probs))
+            row.update(emotion=labels[best], confidence=round(float(probs[best] * 100), 2))
+            row.update({label: round(float(p), 6) for label, p in zip(labels, probs)})
+            rows.append(row)
+        writer.write(rows)
+        pending.clear()
+
+    producer = FrameProducer(files, detector, args, max_pending=args.batch_size * 4)
+    try:
+        for source, frame, time_s, faces in producer:
+            frames += 1
+            if not faces:
+                writer.write([{"source": source, "frame": frame, "time_s": time_s, "face": None,
+                               "emotion": "No Face Detected", "confidence": 0}])
+            for i, (box, crop) in enumerate(faces):
+                x, y, w, h = box
+                pending.append(({"source": source, "frame": frame, "time_s": time_s, "face": i,
+                                 "x": x, "y": y, "w": w, "h": h}, crop))
+                faces_scored += 1
+            if len(pending) >= args.batch_size:
+                flush()
+        if pending:
+            flush()
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"[OK] Scored {frames} frames ({faces_scored} faces) in {elapsed:.1f}s "
+          f"({frames / max(elapsed, 1e-9):.1f} frames/s), {producer.errors} errors -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(score(parse_args()))
@@ -0,0 +1,172 @@
+"""
+Multi-process server for the emotion API.
+
+The parent process imports app.py once (engine, detectors, caches), then
+forks the workers, so the read-only model state is shared copy-on-write
+instead of loaded once per worker. All workers accept on one listening
+socket. The parent restarts workers that die and stops them on
+SIGINT/SIGTERM; a stopping worker finishes serving and flushes queued
+/capture frames before it exits.
+
+Each worker gets cores // workers threads for ONNX Runtime, OpenMP and
+OpenCV, so N workers never run more compute threads than the box has cores.
+Cores are the ones this process may use (affinity mask and cgroup quota),
+not every CPU of the host.
+Thread pools are only created in the workers: an ONNX Runtime session that
+owns intra-op threads deadlocks once forked, so the parent preloads a
+single-threaded session and every worker builds its own in post_fork().
+
+Usage: python serve.py [--workers N] [--host 0.0.0.0] [--port 5000]
+Probes: GET /health (liveness), GET /ready (readiness)
+Smoke test with multi-threaded workers: python check_serve.py --threads 2
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+
+def available_cores():
+    # CPUs this process may actually use: the affinity mask (taskset, cpusets)
+    # capped by a cgroup v2 CPU quota (docker --cpus); os.cpu_count() sees
+    # every CPU of the host
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+
+def parse_args():
+    cores = available_cores()
+    parser = argparse.ArgumentParser(description="Pre-forking server for app.py")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", str(cores))))
+    parser.add_argument("--backlog", type=int, default=1024)
+    return parser.parse_args()
+
+
+def thread_budget(workers):
+    # Compute threads per worker so that workers * threads <= cores
+    return max(1, available_cores() // max(1, workers))
+
+
+def configure_threads(threads):
+    # Must run before numpy/cv2/onnxruntime are imported (i.e. before app)
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(threads))
+    os.environ.setdefault("ONNX_THREADS", str(threads))
+    os.environ.setdefault("ONNX_PROFILE", "many-workers" if threads == 1 else "throughput")
+    # The parent only preloads: app.py keeps its ONNX session single-threaded
+    # and each worker builds its own thread pool in post_fork()
+    os.environ["PREFORK"] = "1"
+
+
+def listen(host, port, backlog):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app_module, sock, threads):
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    import cv2
+    cv2.setNumThreads(threads)
+    app_module.post_fork()
+    server = make_server(sock.getsockname()[0], sock.getsockname()[1], app_module.app,
+                         threaded=True, fd=sock.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return: call it off this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"[OK] Worker {os.getpid()} serving")
+    server.serve_forever()
+    # /capture already answered "saved" for queued frames: write them out
+    app_module.capture_writer.close()
+    print(f"[OK] Worker {os.getpid()} stopped")
+
+
+def spawn(app_module, sock, threads):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app_module, sock, threads)
+        except Exception as e:
+            print(f"[ERROR] Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    args = parse_args()
+    threads = thread_budget(args.workers)
+    configure_threads(threads)
+
+    sock = listen(args.host, args.port, args.backlog)
+    print(f"Preloading app for {args.workers} workers ({threads} threads each)...")
+    import app as app_module
+
+    # Keep the preloaded objects out of the collector so touching their
+    # refcounts in workers does not copy every page they live on
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn(app_module, sock, threads) for _ in range(args.workers)}
+    print(f"[OK] Listening on http://{args.host}:{args.port} with {len(workers)} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"[ERROR] Worker {pid} exited (status {status}), restarting")
+            time.sleep(1)
+            workers.add(spawn(app_module, sock, threads))
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Frame hand-off for the /stream WebSocket endpoint.
+
+A receiver thread keeps reading frames from the socket into a single-slot
+buffer. The sender loop always takes the newest frame, so when inference
+falls behind, stale frames are overwritten (and counted) instead of
+queueing up behind each other.
+"""
+import threading
+
+
+class LatestFrameSlot:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, data):
+        with self.cond:
+            if self.frame is not None:
+                self.dropped += 1
+            self.received += 1
+            self.seq += 1
+            self.frame = (self.seq, data)
+            self.cond.notify()
+
+    def take(self):
+        # Blocks for the next frame; None once closed and drained
+        with self.cond:
+            while self.frame is None and not self.closed:
+                self.cond.wait()
+            frame, self.frame = self.frame, None
+            return frame
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
@@ -0,0 +1,90 @@
+"""
+Per-session face tracking for streaming camera/video clients.
+
+The last face box of each client session is kept in an LRU cache with TTL
+eviction. The next frame from that session is first searched only in a
+padded region around that box; full-frame detection runs only when the
+face is lost.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class FaceTrackCache:
+    def __init__(self, max_sessions=1024, ttl_s=10.0, padding=0.5):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        # ROI grows by this fraction of the box size on every side
+        self.padding = padding
+        self.tracks = OrderedDict()
+        self.lock = threading.Lock()
+        self.roi_hits = 0
+        self.roi_misses = 0
+        self.full_frame = 0
+
+    def get(self, session_id):
+        with self.lock:
+            entry = self.tracks.get(session_id)
+            if entry is None:
+                return None
+            box, stamp = entry
+            if time.monotonic() - stamp > self.ttl_s:
+                del self.tracks[session_id]
+                return None
+            self.tracks.move_to_end(session_id)
+            return box
+
+    def put(self, session_id, box):
+        with self.lock:
+            self.tracks[session_id] = (tuple(int(v) for v in box), time.monotonic())
+            self.tracks.move_to_end(session_id)
+            while len(self.tracks) > self.max_sessions:
+                self.tracks.popitem(last=False)
+
+    def drop(self, session_id):
+        with self.lock:
+            self.tracks.pop(session_id, None)
+
+    def roi(self, box, width, height):
+        x, y, w, h = box
+        pad_w, pad_h = int(w * self.padding), int(h * self.padding)
+        x0, y0 = max(x - pad_w, 0), max(y - pad_h, 0)
+        x1, y1 = min(x + w + pad_w, width), min(y + h + pad_h, height)
+        return x0, y0, x1, y1
+
+    def detect(self, session_id, gray, detect):
+        # detect: callable(gray) -> (N, 4) boxes. Returns boxes in full-frame
+        # coordinates, trying the session's ROI before the whole frame.
+        box = self.get(session_id)
+        if box is not None:
+            x0, y0, x1, y1 = self.roi(box, gray.shape[1], gray.shape[0])
+            faces = np.asarray(detect(gray[y0:y1, x0:x1])).reshape(-1, 4)
+            if len(faces):
+                faces = faces + np.array([x0, y0, 0, 0], dtype=faces.dtype)
+                with self.lock:
+                    self.roi_hits += 1
+                self.put(session_id, faces[0])
+                return faces
+            with self.lock:
+                self.roi_misses += 1
+
+        faces = np.asarray(detect(gray)).reshape(-1, 4)
+        with self.lock:
+            self.full_frame += 1
+        if len(faces):
+            self.put(session_id, faces[0])
+        else:
+            self.drop(session_id)
+        return faces
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self.tracks),
+                "roi_hits": self.roi_hits,
+                "roi_misses": self.roi_misses,
+                "full_frame_detections": self.full_frame,
+            }
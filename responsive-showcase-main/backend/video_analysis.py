@@ -0,0 +1,195 @@
+"""
+Server-side video analysis: frame gating, temporal smoothing and timelines.
+
+Frames are compared with the last analyzed frame on small thumbnails. A
+frame is only sent to detection and inference when the scene changed, the
+face region moved or changed, or max_gap_s passed since the last analyzed
+frame; every other frame reuses the current smoothed result.
+
+Face probabilities are smoothed per face track with an exponential moving
+average (faces are matched across frames by box overlap), and runs of the
+same smoothed emotion are collapsed into timeline segments.
+"""
+import cv2
+import numpy as np
+
+THUMB_SIZE = (64, 36)
+FACE_THUMB_SIZE = (24, 24)
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+class FaceTrack:
+    def __init__(self, track_id, box, probabilities, t):
+        self.id = track_id
+        self.box = box
+        self.probabilities = probabilities.astype(np.float32)
+        self.last_seen = t
+        self.segments = []
+
+    def update(self, box, probabilities, alpha, t):
+        self.box = box
+        # EMA: alpha is the weight of the newest frame
+        self.probabilities += alpha * (probabilities - self.probabilities)
+        self.last_seen = t
+
+
+class VideoAnalyzer:
+    def __init__(self, detect, predict, labels, alpha=0.3, scene_threshold=30.0,
+                 motion_threshold=6.0, max_gap_s=2.0, track_ttl_s=1.5, min_iou=0.3):
+        # detect: gray -> (N, 4) boxes; predict: (gray, boxes) -> (N, classes) probabilities
+        self.detect = detect
+        self.predict = predict
+        self.labels = labels
+        self.alpha = alpha
+        # Mean absolute thumbnail difference (0-255) that counts as a cut / as motion
+        self.scene_threshold = scene_threshold
+        self.motion_threshold = motion_threshold
+        self.max_gap_s = max_gap_s
+        self.track_ttl_s = track_ttl_s
+        self.min_iou = min_iou
+        self.tracks = []
+        self.finished = []
+        self.next_id = 0
+        self.last_thumb = None
+        self.last_face_thumbs = None
+        self.last_analyzed_t = None
+        self.frames = 0
+        self.analyzed = 0
+        self.scene_changes = 0
+
+    def _face_thumbs(self, gray, boxes):
+        return [cv2.resize(gray[y:y+h, x:x+w], FACE_THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+                for x, y, w, h in boxes]
+
+    def _gate(self, gray, t):
+        # Returns (analyze, scene_change, thumbnail of this frame)
+        thumb = cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+        if self.last_thumb is None:
+            return True, True, thumb
+        if np.abs(thumb - self.last_thumb).mean() > self.scene_threshold:
+            return True, True, thumb
+        if t - self.last_analyzed_t >= self.max_gap_s:
+            return True, False, thumb
+        # Expressions change inside the face box long before the frame does
+        boxes = [track.box for track in self.tracks]
+        for before, now in zip(self.last_face_thumbs or [], self._face_thumbs(gray, boxes)):
+            if np.abs(now - before).mean() > self.motion_threshold:
+                return True, False, thumb
+        if not boxes and np.abs(thumb - self.last_thumb).mean() > self.motion_threshold:
+            return True, False, thumb
+        return False, False, thumb
+
+    def process(self, gray, t):
+        # One frame at time t (seconds); returns the current smoothed faces
+        self.frames += 1
+        analyze, scene_change, thumb = self._gate(gray, t)
+        if scene_change and self.last_thumb is not None:
+            self.scene_changes += 1
+            # A cut starts new tracks: never smooth across scenes
+            self._close_tracks(lambda track: True)
+        if analyze:
+            self.analyzed += 1
+            self.last_thumb = thumb
+            self.last_analyzed_t = t
+            self._analyze(gray, t)
+            self.last_face_thumbs = self._face_thumbs(gray, [track.box for track in self.tracks])
+        for track in self.tracks:
+            self._extend_segment(track, t)
+        return {"analyzed": analyze, "scene_change": scene_change,
+                "faces": [self.face_result(track) for track in self.tracks]}
+
+    def _analyze(self, gray, t):
+        boxes = [tuple(int(v) for v in box) for box in np.asarray(self.detect(gray)).reshape(-1, 4)]
+        probabilities = self.predict(gray, boxes) if boxes else []
+        unmatched = list(self.tracks)
+        for box, probs in zip(boxes, probabilities):
+            best = max(unmatched, key=lambda track: box_iou(track.box, box), default=None)
+            if best is not None and box_iou(best.box, box) >= self.min_iou:
+                best.update(box, probs, self.alpha, t)
+                unmatched.remove(best)
+            else:
+                self.tracks.append(FaceTrack(self.next_id, box, probs, t))
+                self.next_id += 1
+        self._close_tracks(lambda track: t - track.last_seen > self.track_ttl_s)
+
+    def _close_tracks(self, should_close):
+        for track in [track for track in self.tracks if should_close(track)]:
+            self.tracks.remove(track)
+            self.finished.append(track)
+
+    def _extend_segment(self, track, t):
+        index = int(np.argmax(track.probabilities))
+        confidence = float(track.probabilities[index])
+        segment = track.segments[-1] if track.segments else None
+        if segment is not None and segment["emotion"] == self.labels[index]:
+            segment["end_s"] = t
+            segment["frames"] += 1
+            segment["confidence_sum"] += confidence
+        else:
+            track.segments.append({"start_s": t, "end_s": t, "emotion": self.labels[index],
+                                   "frames": 1, "confidence_sum": confidence})
+
+    def face_result(self, track):
+        index = int(np.argmax(track.probabilities))
+        return {
+            "face": track.id,
+            "box": list(track.box),
+            "emotion": self.labels[index],
+            "confidence": round(float(track.probabilities[index] * 100), 2),
+            "probabilities": {label: round(float(p * 100), 2)
+                              for label, p in zip(self.labels, track.probabilities)},
+        }
+
+    def timeline(self):
+        # Every segment of every face, ordered by start time
+        segments = []
+        for track in self.finished + self.tracks:
+            for segment in track.segments:
+                segments.append({
+                    "face": track.id,
+                    "start_s": round(segment["start_s"], 3),
+                    "end_s": round(segment["end_s"], 3),
+                    "emotion": segment["emotion"],
+                    "confidence": round(segment["confidence_sum"] / segment["frames"] * 100, 2),
+                    "frames": segment["frames"],
+                })
+        return sorted(segments, key=lambda s: (s["start_s"], s["face"]))
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "analyzed": self.analyzed,
+            "skipped": self.frames - self.analyzed,
+            "scene_changes": self.scene_changes,
+            "faces": self.next_id,
+        }
+
+
+def iter_video_frames(path, sample_fps=None):
+    # Yields (gray, time in seconds) for every frame, or about sample_fps per
+    # second; frames in between are grabbed but never decoded
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open video")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, round(fps / sample_fps)) if sample_fps else 1
+    index = 0
+    try:
+        while capture.grab():
+            if index % step == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), index / fps
+            index += 1
+    finally:
+        capture.release()
@@ -0,0 +1,73 @@
+"""
+tf.data input pipeline for both training scripts.
+
+train.py reads the memory-mapped shards from pack_dataset.py and
+../responsive-showcase-main/emotion-training/train.py the memory-mapped
+FER2013 cache from fer2013.py. Neither copies the images into memory: the
+pipeline shuffles indices only, and each batch reads just its own rows
+from the memory map (tf.numpy_function, in parallel), so nothing is decoded
+per epoch and only the pages in use stay resident. Batches are then
+augmented on all cores (num_parallel_calls=AUTOTUNE), scaled to float32
+[0, 1] with one-hot labels, and prefetched while the model trains.
+
+With a seed the whole pipeline is deterministic: the shuffle order and
+every augmentation (stateless random ops seeded from a seeded
+tf.data.Dataset.random stream) repeat exactly from run to run.
+"""
+import numpy as np
+import tensorflow as tf
+
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_SHAPE = (48, 48, 1)
+# Random translation of up to this many pixels in each direction
+SHIFT_PX = 3
+
+
+def augment_image(image, seed):
+    # uint8 (48, 48, 1) -> float32 [0, 1]: flip, shift and brightness
+    seeds = tf.random.experimental.stateless_split(seed, 3)
+    image = tf.image.stateless_random_flip_left_right(image, seeds[0])
+    size = tf.shape(image)
+    padded = tf.image.pad_to_bounding_box(image, SHIFT_PX, SHIFT_PX,
+                                          size[0] + 2 * SHIFT_PX, size[1] + 2 * SHIFT_PX)
+    image = tf.image.stateless_random_crop(padded, size, seeds[1])
+    image = tf.image.convert_image_dtype(image, tf.float32)
+    image = tf.image.stateless_random_brightness(image, 0.1, seeds[2])
+    return tf.clip_by_value(image, 0.0, 1.0)
+
+
+def make_dataset(read_images, labels, indices, num_classes, batch_size, training=True, augment=False,
+                 seed=None):
+    # read_images: sorted index array -> uint8 (n, 48, 48, 1), e.g. a memory-mapped
+    # array's __getitem__ or PackedDataset.images; labels: integer class indices (N,)
+    labels = np.asarray(labels)
+
+    def read_batch(batch_indices):
+        # Sorted reads walk the memory map forwards; order within a batch does not matter
+        batch_indices = np.sort(batch_indices)
+        return np.asarray(read_images(batch_indices), dtype=np.uint8), labels[batch_indices]
+
+    def read(batch_indices):
+        images, batch_labels = tf.numpy_function(read_batch, [batch_indices],
+                                                 (tf.uint8, tf.as_dtype(labels.dtype)))
+        images.set_shape((None,) + IMAGE_SHAPE)
+        batch_labels.set_shape((None,))
+        return images, batch_labels
+
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if training:
+        dataset = dataset.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(read, num_parallel_calls=AUTOTUNE)
+    if training and augment:
+        seeds = tf.data.Dataset.random(seed=seed, rerandomize_each_iteration=True).batch(2)
+        dataset = tf.data.Dataset.zip((dataset.unbatch(), seeds)).map(
+            lambda sample, pair: (augment_image(sample[0], pair), sample[1]),
+            num_parallel_calls=AUTOTUNE).batch(batch_size)
+    # Scales uint8 batches to [0, 1]; already-augmented float batches pass through
+    dataset = dataset.map(
+        lambda x, y: (tf.image.convert_image_dtype(x, tf.float32), tf.one_hot(y, num_classes)),
+        num_parallel_calls=AUTOTUNE)
+
+    options = tf.data.Options()
+    options.deterministic = seed is not None
+    return dataset.with_options(options).prefetch(AUTOTUNE)
@@ -1,33 +1,33 @@
+import argparse
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Conv2D, MaxPooling2D, Dense, Flatten, Dropout
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+from input_pipeline import make_dataset
+from pack_dataset import ensure_packed
 
 IMG_SIZE = 48
 BATCH_SIZE = 64
 
-datagen = ImageDataGenerator(
-    rescale=1./255,
-    validation_split=0.2
-)
+parser = argparse.ArgumentParser(description="Train the 6-class emotion model on train/")
+parser.add_argument("--seed", type=int, default=None, help="make shuffling, augmentation and weights reproducible")
+parser.add_argument("--augment", action="store_true", help="random flips, shifts and brightness")
+args = parser.parse_args()
+if args.seed is not None:
+    tf.keras.utils.set_random_seed(args.seed)
 
-train_data = datagen.flow_from_directory(
-    "train",
-    target_size=(IMG_SIZE, IMG_SIZE),
-    color_mode="grayscale",
-    class_mode="categorical",
-    batch_size=BATCH_SIZE,
-    subset="training"
-)
+# Decoded once into packed/train (re-packed when the train folder changes);
+# epochs read the memory-mapped shards instead of ~28k JPEGs
+dataset = ensure_packed("train", "packed/train")
 
-val_data = datagen.flow_from_directory(
-    "train",
-    target_size=(IMG_SIZE, IMG_SIZE),
-    color_mode="grayscale",
-    class_mode="categorical",
-    batch_size=BATCH_SIZE,
-    subset="validation"
-)
+# Same 80/20 split as ImageDataGenerator(validation_split=0.2)
+train_idx, val_idx = dataset.split(0.2)
+
+# Batches are read from the shards as they are needed, never copied up front
+train_data = make_dataset(dataset.images, dataset.labels, train_idx, dataset.num_classes,
+                          BATCH_SIZE, training=True, augment=args.augment, seed=args.seed)
+val_data = make_dataset(dataset.images, dataset.labels, val_idx, dataset.num_classes,
+                        BATCH_SIZE, training=False)
 
 model = Sequential([
     Conv2D(32, (3,3), activation="relu", input_shape=(48,48,1)),
@@ -39,7 +39,7 @@ model = Sequential([
     Flatten(),
     Dense(128, activation="relu"),
     Dropout(0.5),
-    Dense(6, activation="softmax")  # 6 emotions
+    Dense(dataset.num_classes, activation="softmax")  # 6 emotions
 ])
 
 model.compile(
@@ -79,6 +79,7 @@ export default function DemoSection() {
     face_detected: boolean;
     emotion: string;
     confidence: number;
+    probabilities?: Record<string, number>;
   } = await res.json();
 
   if (!data.face_detected) {
@@ -99,8 +100,15 @@ export default function DemoSection() {
     Neutral: 0,
   };
 
-  emotionMap[data.emotion as keyof typeof emotionMap] =
-    Math.round(data.confidence);
+  // Full distribution when the backend sends it, else just the top emotion
+  if (data.probabilities) {
+    for (const key of Object.keys(emotionMap) as (keyof typeof emotionMap)[]) {
+      emotionMap[key] = Math.round(data.probabilities[key] ?? 0);
+    }
+  } else {
+    emotionMap[data.emotion as keyof typeof emotionMap] =
+      Math.round(data.confidence);
+  }
 
   setResult(emotionMap);
   setDominantEmotion(data.emotion);
@@ -67,7 +67,16 @@ export async function predictEmotionFromImage(img: HTMLImageElement) {
     neutral: 0,
   };
 
-  emotions[dominantEmotion] = Math.round(result.confidence);
+  // Full distribution when the backend sends it (keyed "Happy", "Sad", ...),
+  // else just the top emotion
+  if (result.probabilities) {
+    for (const key of Object.keys(emotions) as EmotionKey[]) {
+      const label = key.charAt(0).toUpperCase() + key.slice(1);
+      emotions[key] = Math.round(result.probabilities[label] ?? 0);
+    }
+  } else {
+    emotions[dominantEmotion] = Math.round(result.confidence);
+  }
 
   return {
     faceDetected: true,
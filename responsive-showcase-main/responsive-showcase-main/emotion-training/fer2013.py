@@ -0,0 +1,115 @@
+"""
+FER2013 loading for train.py.
+
+fer2013.csv stores every image as a string of 2304 space-separated pixel
+values. parse_fer2013() converts the pixel column in bulk (one NumPy parse
+per chunk of rows instead of str.split per row) straight into one uint8
+(N, 48, 48, 1) array, after checking every row holds exactly 2304 values.
+load_fer2013() caches the result as .npy files next to the CSV and
+memory-maps them on later runs; the cache is reused only while the CSV
+checksum still matches.
+
+Images stay uint8 on disk and in memory; train.py feeds them to the shared
+tf.data pipeline in ../../emotion-training/input_pipeline.py.
+"""
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+IMAGE_SIZE = 48
+NUM_CLASSES = 7
+CHUNK_ROWS = 4096
+CACHE_VERSION = 1
+
+
+def check_row_lengths(pixels, first_row=0):
+    # The joined parse cannot see row boundaries: a short row next to a long
+    # one would shift every later pixel. str.count is a C loop per row; only
+    # rows with irregular spacing are split to count their values.
+    expected = IMAGE_SIZE * IMAGE_SIZE
+    spaces = np.fromiter((p.count(" ") for p in pixels), dtype=np.int64, count=len(pixels))
+    for i in np.flatnonzero(spaces != expected - 1):
+        found = len(pixels[i].split())
+        if found != expected:
+            raise ValueError(f"Row {first_row + i}: expected {expected} pixel values, found {found}")
+
+
+def parse_pixels(pixels, out, first_row=0):
+    # pixels: sequence of "p0 p1 ... p2303" strings; out: (len(pixels), 48, 48, 1) uint8.
+    # One C-level parse of the joined chunk instead of a split() per row;
+    # first_row is the index of pixels[0] in the CSV, for error messages.
+    check_row_lengths(pixels, first_row)
+    with warnings.catch_warnings():
+        # Unparseable text is a DeprecationWarning in NumPy; make it an error
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(" ".join(pixels), dtype=np.uint16, sep=" ")
+        except (ValueError, DeprecationWarning) as e:
+            raise ValueError(f"Malformed pixel data: {e}")
+    if values.size != out.size:
+        raise ValueError(f"Expected {IMAGE_SIZE * IMAGE_SIZE} pixel values per row")
+    if values.size and values.max() > 255:
+        raise ValueError("Pixel value out of range")
+    out.reshape(-1)[:] = values
+    return out
+
+
+def parse_fer2013(csv_path):
+    # Returns (images uint8 (N, 48, 48, 1), labels uint8 (N,), usage str (N,))
+    data = pd.read_csv(csv_path, dtype={"emotion": np.uint8, "pixels": str})
+    images = np.empty((len(data), IMAGE_SIZE, IMAGE_SIZE, 1), dtype=np.uint8)
+    pixels = data["pixels"].fillna("").to_numpy()
+    for start in range(0, len(data), CHUNK_ROWS):
+        parse_pixels(pixels[start:start + CHUNK_ROWS], images[start:start + CHUNK_ROWS], start)
+    labels = data["emotion"].to_numpy(dtype=np.uint8)
+    usage = data["Usage"].to_numpy(dtype=str) if "Usage" in data else np.full(len(data), "Training")
+    return images, labels, usage
+
+
+def file_checksum(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(csv_path):
+    root = os.path.splitext(csv_path)[0] + "_cache"
+    return root, {name: os.path.join(root, f"{name}.npy") for name in ("images", "labels", "usage")}
+
+
+def load_fer2013(csv_path="fer2013.csv", use_cache=True):
+    # Memory-mapped cache when it matches the CSV, otherwise parse and write it
+    cache_dir, paths = cache_paths(csv_path)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    stat = os.stat(csv_path)
+
+    if use_cache and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # Same size and mtime: trust the cache; otherwise compare content checksums
+        fresh = meta.get("version") == CACHE_VERSION and meta["size"] == stat.st_size and (
+            meta["mtime_ns"] == stat.st_mtime_ns or meta["checksum"] == file_checksum(csv_path))
+        if fresh and all(os.path.exists(p) for p in paths.values()):
+            print(f"[OK] Loaded cached dataset from {cache_dir}")
+            return tuple(np.load(paths[name], mmap_mode="r") for name in ("images", "labels", "usage"))
+
+    print(f"Parsing {csv_path}...")
+    images, labels, usage = parse_fer2013(csv_path)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, array in (("images", images), ("labels", labels), ("usage", usage)):
+            np.save(paths[name], array)
+        # Written last: a cache without meta.json is never used
+        meta = {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                "checksum": file_checksum(csv_path), "shape": list(images.shape)}
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        print(f"[OK] Cached {len(images)} images in {cache_dir}")
+    return images, labels, usage
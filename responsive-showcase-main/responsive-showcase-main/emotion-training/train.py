@@ -1,30 +1,40 @@
-import pandas as pd
+import argparse
+import math
+import os
+import sys
 import numpy as np
 import tensorflow as tf
 from sklearn.model_selection import train_test_split
 
-# Load dataset
-data = pd.read_csv("fer2013.csv")
+from fer2013 import NUM_CLASSES, load_fer2013
 
-pixels = data["pixels"].tolist()
-emotions = data["emotion"].tolist()
+# The tf.data pipeline is shared with the folder-based ../../emotion-training/train.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "emotion-training"))
+from input_pipeline import make_dataset
 
-X = []
-y = []
+parser = argparse.ArgumentParser(description="Train the 7-class emotion model on fer2013.csv")
+parser.add_argument("--seed", type=int, default=None, help="make shuffling, augmentation and weights reproducible")
+parser.add_argument("--augment", action="store_true", help="random flips, shifts and brightness")
+args = parser.parse_args()
+if args.seed is not None:
+    tf.keras.utils.set_random_seed(args.seed)
 
-for pix in pixels:
-    img = np.array(pix.split(), dtype="float32")
-    img = img.reshape(48, 48, 1)
-    X.append(img)
+# Load dataset: uint8 (N, 48, 48, 1), memory-mapped from the cache after the first run
+images, emotions, _ = load_fer2013("fer2013.csv")
 
-X = np.array(X) / 255.0
-y = tf.keras.utils.to_categorical(emotions, 7)
-
-# Split dataset
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
+# Split dataset (indices only: images stay uint8 until a batch is requested)
+train_idx, test_idx = train_test_split(
+    np.arange(len(images)), test_size=0.2, random_state=42
 )
 
+# Same hold-out as fit(validation_split=0.1): the last 10% of the training split
+split_at = int(math.ceil(len(train_idx) * (1 - 0.1)))
+# Batches are read from the memory-mapped cache as they are needed
+train_batches = make_dataset(images.__getitem__, emotions, train_idx[:split_at], NUM_CLASSES, 64,
+                             augment=args.augment, seed=args.seed)
+val_batches = make_dataset(images.__getitem__, emotions, train_idx[split_at:], NUM_CLASSES, 64,
+                           training=False)
+
 # CNN Model
 model = tf.keras.models.Sequential([
     tf.keras.layers.Conv2D(32, (3,3), activation='relu', input_shape=(48,48,1)),
@@ -51,11 +61,9 @@ model.compile(
 model.summary()
 
 model.fit(
-    X_train,
-    y_train,
+    train_batches,
     epochs=25,
-    batch_size=64,
-    validation_split=0.1
+    validation_data=val_batches
 )
 
 # Save model